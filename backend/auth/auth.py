@@ -9,16 +9,22 @@ from jwt import PyJWTError as JWTError
 from datetime import datetime, timedelta
 import logging
 
-from backend.database import get_db_connection
+from backend.database import get_connection
+from backend import queries
 from backend.auth.schemas import UserCreate, User, UserLogin
-from backend.auth.utils.hash import hash_password, verify_password
+from backend.auth.utils.hash import hash_password_async, verify_password_async
+from backend.auth.user_cache import get_user, is_revoked
 from backend.auth.utils.tokens import (
     create_email_token,
     create_access_token,
     create_refresh_token,
-    decode_access_token
+    verify_refresh_token,
+    hash_refresh_token,
+    decode_access_token,
+    token_issued_at,
+    AUTH_STATELESS
 )
-from backend.utils.email import send_email
+from backend.services.notifications import enqueue_email, wake_dispatcher
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -58,85 +64,85 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        conn = await get_db_connection()
-        try:
-            user = await conn.fetchrow("SELECT id, email, role FROM users WHERE id = $1", uuid.UUID(user_id))
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-
-            return User(
-                id=str(user["id"]),
-                email=user["email"],
-                role=user["role"]
-            )
-        finally:
-            await conn.close()
+        if AUTH_STATELESS:
+            if is_revoked(user_id, token_issued_at(payload)):
+                raise HTTPException(status_code=401, detail="Token has been revoked")
+            # Tokens issued before the email claim existed fall through to the lookup
+            if payload.get("email"):
+                return User(id=user_id, email=payload["email"], role=payload.get("role", "user"))
+
+        user = await get_user(uuid.UUID(user_id))
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        return User(
+            id=user["id"],
+            email=user["email"],
+            role=user["role"]
+        )
     except JWTError:
         raise HTTPException(status_code=401, detail="Token verification failed")
 
 # ----------- AUTH HANDLERS -----------
 async def signup(user: UserCreate) -> dict:
     logger.info(f"Signup attempt for email: {user.email}")
-    conn = await get_db_connection()
-    try:
+    # Hash before taking a pooled connection so it isn't held for the bcrypt round
+    hashed_pwd = await hash_password_async(user.password)
+    async with get_connection() as conn:
         existing_user = await conn.fetchrow("SELECT email FROM users WHERE email = $1", user.email)
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
         user_id = str(uuid.uuid4())
-        hashed_pwd = hash_password(user.password)
-
-        await conn.execute(
-            "INSERT INTO users (id, email, password, role, is_verified) VALUES ($1, $2, $3, $4, $5)",
-            user_id, user.email, hashed_pwd, "user", False
-        )
-
         verification_token = create_email_token(user_id)
         verification_link = f"{BASE_URL}/auth/verify-email?token={verification_token}"  # ✅ FIXED
 
-        try:
-            send_email(
+        # The verification email is queued with the account, so neither exists without the other
+        async with conn.transaction():
+            await conn.execute(
+                "INSERT INTO users (id, email, password, role, is_verified) VALUES ($1, $2, $3, $4, $5)",
+                user_id, user.email, hashed_pwd, "user", False
+            )
+            await enqueue_email(
+                conn,
                 to_email=user.email,
                 subject="Verify your email",
                 body=f"Please verify your email by clicking this link: {verification_link}"
             )
-        except Exception as e:
-            logger.error(f"Failed to send verification email: {str(e)}")
+        wake_dispatcher()
 
-        access_token = create_access_token(user_id, "user")
+        access_token = create_access_token(user_id, "user", user.email)
         return {
             "access_token": access_token,
             "token_type": "bearer",
             "message": "Signup successful, please verify your email"
         }
-    finally:
-        await conn.close()
 
 @router.post("/auth/login")
 async def login(user: UserLogin, request: Request) -> dict:
-    conn = await get_db_connection()
-    try:
-        db_user = await conn.fetchrow("SELECT id, email, password, role, is_verified FROM users WHERE email = $1", user.email)
-        if not db_user or not verify_password(user.password, db_user["password"]):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
+    async with get_connection() as conn:
+        db_user = await queries.fetchrow(conn, "user_credentials_by_email", user.email)
+    if not db_user or not await verify_password_async(user.password, db_user["password"]):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        if not db_user["is_verified"]:
-            raise HTTPException(status_code=403, detail="Please verify your email before logging in.")
+    if not db_user["is_verified"]:
+        raise HTTPException(status_code=403, detail="Please verify your email before logging in.")
 
-        access_token = create_access_token(db_user["id"], db_user["role"])
-        refresh_token = create_refresh_token(db_user["id"])
-        expires_at = datetime.utcnow() + timedelta(days=7)
+    access_token = create_access_token(db_user["id"], db_user["role"], db_user["email"])
+    refresh_token = create_refresh_token(db_user["id"])
+    expires_at = datetime.utcnow() + timedelta(days=7)
 
-        await conn.execute(
-            "INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES ($1, $2, $3)",
-            db_user["id"], refresh_token, expires_at
+    async with get_connection() as conn:
+        await queries.execute(
+            conn, "insert_refresh_token", db_user["id"], hash_refresh_token(refresh_token), expires_at
         )
 
-        # 📬 Send login alert email
+        # 📬 Queue login alert email
         try:
             user_agent = request.headers.get("user-agent")
             ip_address = request.client.host
-            send_email(
+            await enqueue_email(
+                conn,
                 to_email=db_user["email"],
                 subject="🔐 New Login Alert - Health Assistant",
                 body=f"""Hi,
@@ -153,34 +159,53 @@ Stay safe,
 Your Health Assistant Team"""
             )
         except Exception as e:
-            logger.warning(f"Login alert email failed: {str(e)}")
+            logger.warning(f"Login alert email failed to queue: {str(e)}")
 
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer"
-        }
-    finally:
-        await conn.close()
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+async def rotate_refresh_token(refresh_token: str) -> dict:
+    """Exchange a live refresh token for a new access/refresh pair; each token works exactly once."""
+    try:
+        user_id = verify_refresh_token(refresh_token)
+    except ValueError as e:
+        logger.error(f"Refresh token verification failed: {str(e)}")
+        raise HTTPException(status_code=401, detail=str(e))
+
+    new_refresh_token = create_refresh_token(user_id)
+    expires_at = datetime.utcnow() + timedelta(days=7)
+
+    async with get_connection() as conn:
+        async with conn.transaction():
+            user = await queries.fetchrow(
+                conn, "rotate_refresh_token",
+                hash_refresh_token(refresh_token), user_id, hash_refresh_token(new_refresh_token), expires_at
+            )
+    if not user:
+        logger.error(f"Invalid or expired refresh token for user_id: {user_id}")
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    return {
+        "access_token": create_access_token(user["id"], user["role"], user["email"]),
+        "refresh_token": new_refresh_token,
+        "token_type": "bearer"
+    }
 
 # ----------- PROFILE UPDATES -----------
 @router.put("/user/phone")
 async def update_phone(data: PhoneUpdateRequest, current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         await conn.execute("UPDATE users SET phone = $1 WHERE id = $2", data.phone, current_user.id)
         return {"message": "Phone number updated"}
-    finally:
-        await conn.close()
 
 @router.put("/user/preference")
 async def update_preference(data: PreferenceUpdateRequest, current_user: User = Depends(get_current_user)):
     if data.preference not in ["email", "sms", "both"]:
         raise HTTPException(status_code=400, detail="Invalid preference. Use 'email', 'sms', or 'both'.")
 
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         await conn.execute("UPDATE users SET preference = $1 WHERE id = $2", data.preference, current_user.id)
         return {"message": f"Notification preference updated to '{data.preference}'"}
-    finally:
-        await conn.close()
@@ -1,8 +1,8 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from backend.auth.schemas import User
-from backend.database import get_db_connection
-from backend.auth.utils.tokens import decode_access_token  # ✅ Correct path now
+from backend.auth.user_cache import get_user, is_revoked
+from backend.auth.utils.tokens import decode_access_token, token_issued_at, AUTH_STATELESS  # ✅ Correct path now
 
 security = HTTPBearer()
 
@@ -15,11 +15,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     user_id = payload.get("sub")
     role = payload.get("role", "user")
 
-    conn = await get_db_connection()
-    try:
-        user = await conn.fetchrow("SELECT id, email, role FROM users WHERE id = $1", user_id)
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return User(id=user["id"], email=user["email"], role=user["role"])
-    finally:
-        await conn.close()
+    if AUTH_STATELESS:
+        if is_revoked(user_id, token_issued_at(payload)):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+        # Tokens issued before the email claim existed fall through to the lookup
+        if user_id and payload.get("email"):
+            return User(id=user_id, email=payload["email"], role=role)
+
+    user = await get_user(user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return User(id=user["id"], email=user["email"], role=user["role"])
@@ -8,20 +8,23 @@ from jose import jwt
 import httpx
 import os
 import uuid
+import pytz
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 
-from backend.auth.auth import signup, login, get_current_user
+from backend.auth.auth import signup, login, get_current_user, rotate_refresh_token
 from backend.auth.schemas import (
     UserCreate, UserLogin, ForgotPasswordRequest, ResetPasswordRequest, User, PasswordUpdateRequest
 )
-from backend.database import get_db_connection
+from backend.database import get_connection
+from backend import queries
 from backend.auth.utils.tokens import (
     create_email_token, verify_email_token, create_access_token,
-    verify_refresh_token, create_refresh_token
+    create_refresh_token, hash_refresh_token
 )
-from backend.utils.email import send_email
-from backend.auth.utils.hash import hash_password, verify_password
+from backend.services.notifications import enqueue_email
+from backend.auth.utils.hash import hash_password_async, verify_password_async
+from backend.auth.user_cache import invalidate_user, revoke_user
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 logger = logging.getLogger(__name__)
@@ -40,6 +43,9 @@ class PhoneUpdateRequest(BaseModel):
 class NotificationPreferenceRequest(BaseModel):
     method: str  # 'email', 'sms', or 'both'
 
+class TimezoneUpdateRequest(BaseModel):
+    timezone: str  # IANA name, e.g. 'America/New_York'
+
 class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
@@ -102,8 +108,7 @@ async def google_callback(code: str):
             logger.error("Email not found in Google ID token")
             raise HTTPException(status_code=400, detail="Email not found in token")
 
-        conn = await get_db_connection()
-        try:
+        async with get_connection() as conn:
             user = await conn.fetchrow("SELECT id, email, role FROM users WHERE email = $1", email)
             if not user:
                 user_id = str(uuid.uuid4())
@@ -119,14 +124,11 @@ async def google_callback(code: str):
                 user_id = user["id"]
                 role = user["role"]
 
-            access_token = create_access_token(user_id, role)
+            access_token = create_access_token(user_id, role, email)
             refresh_token = create_refresh_token(user_id)
 
             expires_at = datetime.utcnow() + timedelta(days=7)
-            await conn.execute(
-                "INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES ($1, $2, $3)",
-                user_id, refresh_token, expires_at
-            )
+            await queries.execute(conn, "insert_refresh_token", user_id, hash_refresh_token(refresh_token), expires_at)
 
             logger.info(f"Google login successful for email: {email}")
             frontend_redirect_url = (
@@ -134,8 +136,6 @@ async def google_callback(code: str):
                 f"?access_token={access_token}&refresh_token={refresh_token}"
             )
             return RedirectResponse(url=frontend_redirect_url)
-        finally:
-            await conn.close()
 
 # -------------------- GOOGLE LOGIN (TOKEN-BASED FLOW) --------------------
 @router.post("/google-login-token")
@@ -148,8 +148,7 @@ async def google_login_token(request: GoogleLoginRequest):
         )
         email = id_info["email"]
 
-        conn = await get_db_connection()
-        try:
+        async with get_connection() as conn:
             user = await conn.fetchrow("SELECT id, email, role FROM users WHERE email = $1", email)
             if not user:
                 user_id = str(uuid.uuid4())
@@ -165,17 +164,11 @@ async def google_login_token(request: GoogleLoginRequest):
                 user_id = user["id"]
                 role = user["role"]
 
-            access_token = create_access_token(user_id, role)
+            access_token = create_access_token(user_id, role, email)
             refresh_token = create_refresh_token(user_id)
 
             expires_at = datetime.utcnow() + timedelta(days=7)
-            await conn.execute(
-                """
-                INSERT INTO refresh_tokens (user_id, token, expires_at)
-                VALUES ($1, $2, $3)
-                """,
-                user_id, refresh_token, expires_at
-            )
+            await queries.execute(conn, "insert_refresh_token", user_id, hash_refresh_token(refresh_token), expires_at)
 
             logger.info(f"Google token login successful for email: {email}")
             return {
@@ -184,8 +177,6 @@ async def google_login_token(request: GoogleLoginRequest):
                 "token_type": "bearer",
                 "message": "Google login successful"
             }
-        finally:
-            await conn.close()
     except ValueError as e:
         logger.error(f"Google token validation failed: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid Google token")
@@ -197,8 +188,7 @@ async def set_password(
     current_user: User = Depends(get_current_user)
 ):
     logger.info(f"Password set requested for user_id: {current_user.id}")
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         user = await conn.fetchrow("SELECT auth_provider, password FROM users WHERE id = $1", current_user.id)
         if not user:
             logger.error(f"User not found for id: {current_user.id}")
@@ -212,22 +202,20 @@ async def set_password(
             logger.warning(f"User {current_user.id} already has a password set")
             raise HTTPException(status_code=403, detail="Password already set")
 
-        hashed_pw = hash_password(request.new_password)
+        hashed_pw = await hash_password_async(request.new_password)
         await conn.execute(
             "UPDATE users SET password = $1 WHERE id = $2", hashed_pw, current_user.id
         )
+        await invalidate_user(current_user.id)
         logger.info(f"Password set successfully for user_id: {current_user.id}")
         return {"message": "Password set successfully"}
-    finally:
-        await conn.close()
 
 # -------------------- EMAIL VERIFICATION --------------------
 @router.get("/verify-email")
 async def verify_email(token: str = Query(...)):
     try:
         user_id = verify_email_token(token)
-        conn = await get_db_connection()
-        try:
+        async with get_connection() as conn:
             user = await conn.fetchrow("SELECT id, email FROM users WHERE id = $1", user_id)
             if not user:
                 logger.error(f"User not found for id: {user_id}")
@@ -235,8 +223,6 @@ async def verify_email(token: str = Query(...)):
             await conn.execute("UPDATE users SET is_verified = TRUE WHERE id = $1", user_id)
             logger.info(f"Email verified for user_id: {user_id}")
             return {"message": "Email verified successfully!"}
-        finally:
-            await conn.close()
     except ValueError as e:
         logger.error(f"Email verification failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -245,8 +231,7 @@ async def verify_email(token: str = Query(...)):
 @router.post("/resend-verification")
 async def resend_verification(request: ForgotPasswordRequest):
     logger.info(f"Resend verification requested for email: {request.email}")
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         user = await conn.fetchrow("SELECT id, is_verified FROM users WHERE email = $1", request.email)
         if not user:
             logger.error(f"Email not found: {request.email}")
@@ -258,24 +243,22 @@ async def resend_verification(request: ForgotPasswordRequest):
         token = create_email_token(user["id"])
         link = f"{BACKEND_URL}/auth/verify-email?token={token}"
         try:
-            send_email(
+            await enqueue_email(
+                conn,
                 to_email=request.email,
                 subject="Verify your email",
                 body=f"Click here to verify your email: {link}"
             )
-            logger.info(f"Verification email resent to: {request.email}")
+            logger.info(f"Verification email queued for: {request.email}")
         except Exception as e:
-            logger.error(f"Failed to resend verification email to {request.email}: {str(e)}")
+            logger.error(f"Failed to queue verification email to {request.email}: {str(e)}")
         return {"message": "Verification email resent successfully"}
-    finally:
-        await conn.close()
 
 # -------------------- FORGOT PASSWORD --------------------
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest):
     logger.info(f"Forgot password requested for email: {request.email}")
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         user = await conn.fetchrow("SELECT id, email FROM users WHERE email = $1", request.email)
         if not user:
             logger.error(f"Email not found: {request.email}")
@@ -284,17 +267,16 @@ async def forgot_password(request: ForgotPasswordRequest):
         token = create_email_token(user["id"])
         reset_link = f"{FRONTEND_URL}/reset-password?token={token}"
         try:
-            send_email(
+            await enqueue_email(
+                conn,
                 to_email=request.email,
                 subject="Reset your password",
                 body=f"Click here to reset your password: {reset_link}"
             )
-            logger.info(f"Password reset link sent to: {request.email}")
+            logger.info(f"Password reset link queued for: {request.email}")
         except Exception as e:
-            logger.error(f"Failed to send password reset email to {request.email}: {str(e)}")
+            logger.error(f"Failed to queue password reset email to {request.email}: {str(e)}")
         return {"message": "Password reset link sent to your email"}
-    finally:
-        await conn.close()
 
 # -------------------- RESET PASSWORD --------------------
 @router.post("/reset-password")
@@ -306,19 +288,17 @@ async def reset_password(request: ResetPasswordRequest):
         logger.error(f"Password reset failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         user = await conn.fetchrow("SELECT id FROM users WHERE id = $1", user_id)
         if not user:
             logger.error(f"User not found for id: {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
 
-        hashed_pw = hash_password(request.new_password)
+        hashed_pw = await hash_password_async(request.new_password)
         await conn.execute("UPDATE users SET password = $1 WHERE id = $2", hashed_pw, user_id)
+        await revoke_user(user_id)
         logger.info(f"Password reset successful for user_id: {user_id}")
         return {"message": "Password reset successful"}
-    finally:
-        await conn.close()
 
 # -------------------- UPDATE PASSWORD --------------------
 @router.put("/update-password")
@@ -331,139 +311,48 @@ async def update_password(
         logger.error("Unauthorized attempt to update password")
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         user = await conn.fetchrow("SELECT password FROM users WHERE id = $1", current_user.id)
         if not user:
             logger.error(f"User not found for id: {current_user.id}")
             raise HTTPException(status_code=404, detail="User not found")
-        if not verify_password(request.old_password, user["password"]):
+        if not await verify_password_async(request.old_password, user["password"]):
             logger.warning(f"Old password incorrect for user_id: {current_user.id}")
             raise HTTPException(status_code=403, detail="Old password is incorrect")
 
-        hashed = hash_password(request.new_password)
+        hashed = await hash_password_async(request.new_password)
         await conn.execute("UPDATE users SET password = $1 WHERE id = $2", hashed, current_user.id)
+        await revoke_user(current_user.id)
         logger.info(f"Password updated successfully for user_id: {current_user.id}")
         return {"message": "Password updated successfully"}
-    finally:
-        await conn.close()
 
 # -------------------- REFRESH TOKEN --------------------
 @router.post("/refresh")
 async def refresh_token(request: RefreshTokenRequest):
     logger.info("Refresh token requested")
-    try:
-        user_id = verify_refresh_token(request.refresh_token)
-        conn = await get_db_connection()
-        try:
-            record = await conn.fetchrow(
-                """
-                SELECT * FROM refresh_tokens 
-                WHERE token = $1 AND revoked = FALSE AND expires_at > NOW()
-                """,
-                request.refresh_token
-            )
-            if not record:
-                logger.error(f"Invalid or expired refresh token for user_id: {user_id}")
-                raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
-
-            user = await conn.fetchrow("SELECT id, role FROM users WHERE id = $1", user_id)
-            if not user:
-                logger.error(f"User not found for id: {user_id}")
-                raise HTTPException(status_code=404, detail="User not found")
-
-            new_access_token = create_access_token(user["id"], user["role"])
-            new_refresh_token = create_refresh_token(user["id"])
-            expires_at = datetime.utcnow() + timedelta(days=7)
-            
-            await conn.execute(
-                "UPDATE refresh_tokens SET revoked = TRUE WHERE token = $1",
-                request.refresh_token
-            )
-            await conn.execute(
-                "INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES ($1, $2, $3)",
-                user["id"], new_refresh_token, expires_at
-            )
-
-            logger.info(f"Access token refreshed for user_id: {user_id}")
-            return {
-                "access_token": new_access_token,
-                "refresh_token": new_refresh_token,
-                "token_type": "bearer"
-            }
-        finally:
-            await conn.close()
-    except ValueError as e:
-        logger.error(f"Refresh token verification failed: {str(e)}")
-        raise HTTPException(status_code=401, detail=str(e))
+    return await rotate_refresh_token(request.refresh_token)
 
 # -------------------- REFRESH TOKEN (NEW ENDPOINT) --------------------
 @router.post("/refresh-token")
 async def refresh_token_endpoint(request: RefreshTokenRequest):
     logger.info("Refresh token requested via /refresh-token")
-    try:
-        user_id = verify_refresh_token(request.refresh_token)
-        conn = await get_db_connection()
-        try:
-            record = await conn.fetchrow(
-                """
-                SELECT * FROM refresh_tokens 
-                WHERE token = $1 AND revoked = FALSE AND expires_at > NOW()
-                """,
-                request.refresh_token
-            )
-            if not record:
-                logger.error(f"Invalid or expired refresh token for user_id: {user_id}")
-                raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
-
-            user = await conn.fetchrow("SELECT id, role FROM users WHERE id = $1", user_id)
-            if not user:
-                logger.error(f"User not found for id: {user_id}")
-                raise HTTPException(status_code=404, detail="User not found")
-
-            new_access_token = create_access_token(user["id"], user["role"])
-            new_refresh_token = create_refresh_token(user["id"])
-            expires_at = datetime.utcnow() + timedelta(days=7)
-            
-            await conn.execute(
-                "UPDATE refresh_tokens SET revoked = TRUE WHERE token = $1",
-                request.refresh_token
-            )
-            await conn.execute(
-                "INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES ($1, $2, $3)",
-                user["id"], new_refresh_token, expires_at
-            )
-
-            logger.info(f"Access token refreshed for user_id: {user_id} via /refresh-token")
-            return {
-                "access_token": new_access_token,
-                "refresh_token": new_refresh_token,
-                "token_type": "bearer"
-            }
-        finally:
-            await conn.close()
-    except ValueError as e:
-        logger.error(f"Refresh token verification failed: {str(e)}")
-        raise HTTPException(status_code=401, detail=str(e))
+    return await rotate_refresh_token(request.refresh_token)
 
 # -------------------- LOGOUT --------------------
 @router.post("/logout")
 async def logout(request: RefreshTokenRequest):
     logger.info("Logout requested")
-    conn = await get_db_connection()
-    try:
-        result = await conn.execute(
-            "UPDATE refresh_tokens SET revoked = TRUE WHERE token = $1",
-            request.refresh_token
-        )
-        if result == "UPDATE 0":
-            logger.warning(f"Refresh token not found or already revoked: {request.refresh_token}")
+    async with get_connection() as conn:
+        user_id = await queries.fetchval(conn, "revoke_refresh_token", hash_refresh_token(request.refresh_token))
+        if user_id is None:
+            logger.warning("Refresh token not found or already revoked")
             raise HTTPException(status_code=400, detail="Refresh token not found or already revoked")
-        
+
+        # Outstanding access tokens are otherwise honoured until expiry in stateless mode
+        await revoke_user(user_id)
+
         logger.info("Logout successful")
         return {"message": "Logged out successfully"}
-    finally:
-        await conn.close()
 
 # -------------------- PROFILE SETTINGS --------------------
 @router.put("/update-phone")
@@ -473,15 +362,12 @@ async def update_phone(request: PhoneUpdateRequest, current_user: User = Depends
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     logger.info(f"Updating phone for user_id: {current_user.id}")
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         await conn.execute(
             "UPDATE users SET phone = $1 WHERE id = $2",
             request.phone, current_user.id
         )
         return {"message": "Phone number updated successfully"}
-    finally:
-        await conn.close()
 
 @router.put("/set-notification-method")
 async def set_notification_method(request: NotificationPreferenceRequest, current_user: User = Depends(get_current_user)):
@@ -494,12 +380,26 @@ async def set_notification_method(request: NotificationPreferenceRequest, curren
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     logger.info(f"Setting notification method to '{request.method}' for user_id: {current_user.id}")
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         await conn.execute(
             "UPDATE users SET preferred_notification = $1 WHERE id = $2",
             request.method, current_user.id
         )
         return {"message": f"Notification method set to '{request.method}'"}
-    finally:
-        await conn.close()
\ No newline at end of file
+
+@router.put("/set-timezone")
+async def set_timezone(request: TimezoneUpdateRequest, current_user: User = Depends(get_current_user)):
+    if request.timezone not in pytz.all_timezones_set:
+        logger.error(f"Invalid timezone: {request.timezone}")
+        raise HTTPException(status_code=400, detail="Invalid timezone. Use an IANA name such as 'Europe/Berlin'")
+
+    logger.info(f"Setting timezone to '{request.timezone}' for user_id: {current_user.id}")
+    async with get_connection() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "UPDATE users SET timezone = $1 WHERE id = $2",
+                request.timezone, current_user.id
+            )
+            # Reminder times are wall-clock times, so their UTC fire times move with the zone
+            await queries.execute(conn, "reschedule_user_reminders", str(current_user.id), request.timezone)
+        return {"message": f"Timezone set to '{request.timezone}'"}
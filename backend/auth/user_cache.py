@@ -0,0 +1,166 @@
+# backend/auth/user_cache.py
+# Cache of the (id, email, role) rows looked up by get_current_user on every authenticated request.
+#
+# Tier 1 is an in-process TTL/LRU cache. When USER_CACHE_REDIS_URL is set, Redis acts as a
+# shared tier 2 and carries invalidations between workers over pub/sub, so a role or password
+# change on one worker evicts the row everywhere.
+#
+# It also keeps the revocation set consulted in stateless auth mode (AUTH_STATELESS), where
+# access tokens are trusted without a user lookup until they expire.
+import asyncio
+import json
+import logging
+import os
+import time
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+from backend.database import get_connection
+from backend import queries
+from backend.auth.utils.tokens import ACCESS_TOKEN_EXPIRE_MINUTES, AUTH_STATELESS
+
+load_dotenv()
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10_000))
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+
+REDIS_KEY_PREFIX = "user:"
+REDIS_INVALIDATION_CHANNEL = "user-cache-invalidate"
+REDIS_REVOKED_PREFIX = "revoked:"
+REDIS_REVOCATION_CHANNEL = "user-revoked"
+
+# An entry only has to outlive the access tokens it rejects
+REVOCATION_TTL = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+logger = logging.getLogger(__name__)
+
+_local = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
+# user id -> revocation time (epoch seconds)
+_revoked = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=REVOCATION_TTL)
+_redis = None
+_listener_task = None
+
+def _get_redis():
+    global _redis
+    if USER_CACHE_REDIS_URL and _redis is None:
+        import redis.asyncio as redis
+        _redis = redis.from_url(USER_CACHE_REDIS_URL, decode_responses=True)
+    return _redis
+
+async def get_user(user_id) -> dict:
+    """Return {"id", "email", "role"} for the user, or None if they don't exist."""
+    key = str(user_id)
+    user = _local.get(key)
+    if user is not None:
+        return user
+
+    client = _get_redis()
+    if client is not None:
+        try:
+            cached = await client.get(REDIS_KEY_PREFIX + key)
+            if cached:
+                user = json.loads(cached)
+                _local[key] = user
+                return user
+        except Exception as e:
+            logger.warning(f"User cache Redis read failed: {str(e)}")
+
+    async with get_connection() as conn:
+        row = await queries.fetchrow(conn, "user_by_id", user_id)
+    if not row:
+        return None
+
+    user = {"id": str(row["id"]), "email": row["email"], "role": row["role"]}
+    _local[key] = user
+    if client is not None:
+        try:
+            await client.set(REDIS_KEY_PREFIX + key, json.dumps(user), ex=int(USER_CACHE_TTL))
+        except Exception as e:
+            logger.warning(f"User cache Redis write failed: {str(e)}")
+    return user
+
+async def invalidate_user(user_id):
+    """Call after changing a user's role, email or password."""
+    key = str(user_id)
+    _local.pop(key, None)
+
+    client = _get_redis()
+    if client is not None:
+        try:
+            await client.delete(REDIS_KEY_PREFIX + key)
+            await client.publish(REDIS_INVALIDATION_CHANNEL, key)
+        except Exception as e:
+            logger.warning(f"User cache Redis invalidation failed: {str(e)}")
+
+def is_revoked(user_id, issued_at) -> bool:
+    """True if the user was revoked at or after `issued_at` (tokens.token_issued_at of the token)."""
+    revoked_at = _revoked.get(str(user_id))
+    return revoked_at is not None and (issued_at is None or issued_at <= revoked_at)
+
+async def revoke_user(user_id):
+    """Reject the user's outstanding access tokens (logout, password change, disabled account)."""
+    key = str(user_id)
+    # Millisecond precision, matching the iat_ms claim it is compared against
+    revoked_at = int(time.time() * 1000) / 1000
+    _revoked[key] = revoked_at
+    _local.pop(key, None)
+
+    client = _get_redis()
+    if client is not None:
+        try:
+            await client.set(REDIS_REVOKED_PREFIX + key, revoked_at, ex=REVOCATION_TTL)
+            await client.delete(REDIS_KEY_PREFIX + key)
+            await client.publish(REDIS_REVOCATION_CHANNEL, f"{key} {revoked_at}")
+        except Exception as e:
+            logger.warning(f"User revocation Redis publish failed: {str(e)}")
+
+async def _load_revocations(client):
+    async for redis_key in client.scan_iter(match=REDIS_REVOKED_PREFIX + "*"):
+        revoked_at = await client.get(redis_key)
+        if revoked_at is not None:
+            _revoked[redis_key[len(REDIS_REVOKED_PREFIX):]] = float(revoked_at)
+
+async def _listen_for_invalidations():
+    while True:
+        try:
+            client = _get_redis()
+            pubsub = client.pubsub()
+            await pubsub.subscribe(REDIS_INVALIDATION_CHANNEL, REDIS_REVOCATION_CHANNEL)
+            # Messages published while we were disconnected are lost, so start clean
+            _local.clear()
+            await _load_revocations(client)
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    if message["channel"] == REDIS_REVOCATION_CHANNEL:
+                        key, revoked_at = message["data"].split()
+                        _revoked[key] = max(float(revoked_at), _revoked.get(key, 0.0))
+                        _local.pop(key, None)
+                    else:
+                        _local.pop(message["data"], None)
+            finally:
+                await pubsub.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"User cache invalidation listener disconnected: {str(e)}")
+            await asyncio.sleep(5)
+
+async def start_invalidation_listener():
+    global _listener_task
+    if AUTH_STATELESS and not USER_CACHE_REDIS_URL:
+        logger.warning(
+            "AUTH_STATELESS is on without USER_CACHE_REDIS_URL: revocations only reach the process "
+            "that made them, so with several workers a logged-out token stays valid on the others "
+            "until it expires. Set USER_CACHE_REDIS_URL or run a single worker."
+        )
+    if USER_CACHE_REDIS_URL and _listener_task is None:
+        _listener_task = asyncio.create_task(_listen_for_invalidations())
+        logger.info("✅ User cache invalidation listener started")
+
+async def stop_invalidation_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        _listener_task = None
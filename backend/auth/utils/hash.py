@@ -1,7 +1,31 @@
+import asyncio
 import bcrypt
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt releases the GIL while hashing, so a small thread pool runs hashes in parallel
+# without blocking the event loop. Each hash costs ~100-300 ms of CPU.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", min(4, os.cpu_count() or 1)))
+
+_executor = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
 
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+# Use these from async handlers; the sync versions above would stall every request on the worker
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_executor(), verify_password, plain_password, hashed_password
+    )
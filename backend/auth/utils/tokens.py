@@ -1,13 +1,17 @@
 # backend/auth/utils/tokens.py
+import hashlib
 import jwt
 import os
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from uuid import UUID
+from uuid import UUID, uuid4
 
 
 load_dotenv()
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Trust the signed sub/email/role claims instead of looking the user up on every request
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
 
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key")
@@ -38,15 +42,28 @@ def verify_email_token(token: str) -> str:
     except jwt.InvalidTokenError:
         raise ValueError("Invalid token")
 
-def create_access_token(user_id: UUID, role: str):
+def create_access_token(user_id: UUID, role: str, email: str = None):
+    now = datetime.utcnow()
     payload = {
         "sub": str(user_id),  # 🔥 Convert UUID to string
         "role": role,
-        "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        "iat": now,
+        # iat is whole seconds; revocation checks need to order a token against a logout in the same second
+        "iat_ms": int(time.time() * 1000),
+        "exp": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     }
+    if email:
+        payload["email"] = email
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def token_issued_at(payload: dict):
+    """Issue time of an access token in epoch seconds, to the millisecond when the token carries iat_ms."""
+    if payload.get("iat_ms") is not None:
+        return payload["iat_ms"] / 1000
+    # Tokens minted before iat_ms existed: whole seconds, so same-second tokens count as revoked
+    return payload.get("iat")
+
 def decode_access_token(token: str) -> dict:
     """
     Decode and verify an access token, returning its payload.
@@ -66,10 +83,18 @@ def create_refresh_token(user_id: str, expires_in_minutes: int = 1440) -> str:
     payload = {
         "sub": str(user_id),  # ✅ Fix here
         "type": "refresh",
-        "exp": datetime.utcnow() + timedelta(minutes=expires_in_minutes)
+        "exp": datetime.utcnow() + timedelta(minutes=expires_in_minutes),
+        # Two tokens minted for one user in the same second would otherwise be identical
+        "jti": uuid4().hex
     }
     return jwt.encode(payload, REFRESH_SECRET, algorithm=ALGORITHM)
 
+def hash_refresh_token(token: str) -> bytes:
+    """
+    SHA-256 digest stored in refresh_tokens.token_hash in place of the raw token.
+    """
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
 
 def verify_refresh_token(token: str) -> str:
     """
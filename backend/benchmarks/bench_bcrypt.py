@@ -0,0 +1,55 @@
+# backend/benchmarks/bench_bcrypt.py
+# Usage: python -m backend.benchmarks.bench_bcrypt --logins 64
+#
+# Simulates a burst of concurrent logins on one event loop and compares inline bcrypt
+# (verify_password) with the thread-pool version (verify_password_async). Alongside login
+# throughput it reports how long the loop stalled, i.e. how late every other request would be.
+import argparse
+import asyncio
+import time
+
+from backend.auth.utils import hash as hash_utils
+
+async def heartbeat(interval: float, lags: list, stop: asyncio.Event):
+    # Wakes every `interval` seconds; any extra delay is time the loop spent blocked
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+async def run_burst(label: str, verify, logins: int, hashed: str):
+    lags = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(0.01, lags, stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify("correct horse battery staple", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await monitor
+    assert all(results)
+    print(
+        f"{label:<10}{logins:>8}{elapsed:>11.2f}s{logins / elapsed:>12.1f}/s"
+        f"{max(lags, default=0) * 1000:>14.1f}ms"
+    )
+
+async def main(args):
+    if args.workers:
+        hash_utils.BCRYPT_WORKERS = args.workers
+    hashed = hash_utils.hash_password("correct horse battery staple")
+
+    async def inline_verify(plain, hashed_password):
+        return hash_utils.verify_password(plain, hashed_password)
+
+    print(f"bcrypt worker threads: {hash_utils.BCRYPT_WORKERS}")
+    print(f"{'mode':<10}{'logins':>8}{'elapsed':>12}{'throughput':>14}{'max loop stall':>16}")
+    await run_burst("inline", inline_verify, args.logins, hashed)
+    await run_burst("offloaded", hash_utils.verify_password_async, args.logins, hashed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-login throughput with inline vs offloaded bcrypt")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="Override BCRYPT_WORKERS")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+# backend/benchmarks/bench_email.py
+# Usage: python -m backend.benchmarks.bench_email --messages 500 --latency-ms 80
+#
+# Starts a local stub of the SendGrid /v3/mail/send endpoint that answers 202 after a fixed
+# delay, then compares one-at-a-time blocking sends (send_email) with EmailClient.send_many.
+# Nothing leaves the machine.
+import argparse
+import asyncio
+import time
+
+from backend.utils import email as email_utils
+
+SENDGRID_ACCEPTED = b"HTTP/1.1 202 Accepted\r\nContent-Length: 0\r\n\r\n"
+
+async def handle_stub_connection(reader, writer, latency: float, stats: dict, response: bytes):
+    # Minimal HTTP/1.1 keep-alive server: headers, Content-Length body, then a canned response
+    stats["connections"] += 1
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(latency)
+            stats["requests"] += 1
+            writer.write(response)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        # Cancelled when the benchmark loop shuts down with keep-alive connections still open
+        pass
+    finally:
+        writer.close()
+
+async def start_stub(latency: float, response: bytes = SENDGRID_ACCEPTED):
+    stats = {"connections": 0, "requests": 0}
+    server = await asyncio.start_server(
+        lambda r, w: handle_stub_connection(r, w, latency, stats, response), "127.0.0.1", 0
+    )
+    host, port = server.sockets[0].getsockname()[:2]
+    return server, f"http://{host}:{port}", stats
+
+def report(label: str, count: int, elapsed: float, stats: dict):
+    print(f"{label:<22}{count:>9}{elapsed:>11.2f}s{count / elapsed:>12.1f}/s{stats['connections']:>13}")
+    stats["connections"] = stats["requests"] = 0
+
+async def main(args):
+    server, base_url, stats = await start_stub(args.latency_ms / 1000)
+    messages = [(f"user{i}@example.com", "Health Reminder", f"Message {i}") for i in range(args.messages)]
+
+    # Point the module-level blocking sender at the stub before its client is created
+    email_utils.SENDGRID_API_BASE_URL = base_url
+    email_utils.SENDGRID_API_KEY = "bench-key"
+    email_utils.EMAIL_USER = "bench@example.com"
+
+    print(f"stub latency {args.latency_ms:.0f}ms, concurrency {args.concurrency}")
+    print(f"{'mode':<22}{'messages':>9}{'elapsed':>12}{'throughput':>14}{'connections':>13}")
+
+    sequential = messages[:args.sequential]
+    started = time.perf_counter()
+    for message in sequential:
+        # In a thread so the stub, which shares this loop, can answer
+        await asyncio.to_thread(email_utils.send_email, *message)
+    report("sequential send_email", len(sequential), time.perf_counter() - started, stats)
+    if email_utils._sync_client is not None:
+        email_utils._sync_client.close()
+
+    client = email_utils.EmailClient(
+        api_key="bench-key", sender="bench@example.com", base_url=base_url, max_concurrency=args.concurrency
+    )
+    try:
+        started = time.perf_counter()
+        results = await client.send_many(messages)
+        elapsed = time.perf_counter() - started
+        assert all(result.ok for result in results), [r.error for r in results if not r.ok][:3]
+        report("EmailClient.send_many", len(messages), elapsed, stats)
+    finally:
+        await client.aclose()
+        server.close()
+        await server.wait_closed()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Email send throughput against a local SendGrid stub")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--sequential", type=int, default=50, help="How many messages the blocking baseline sends")
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--concurrency", type=int, default=email_utils.EMAIL_MAX_CONCURRENCY)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_general_query.py
+# Usage: python -m backend.benchmarks.bench_general_query --queries 200 --latency-ms 400 --concurrency 20
+#
+# Starts a local stub of the OpenAI chat completions endpoint that answers a canned symptom
+# answer after a fixed delay. It then compares the old handle_general_query flow for symptom
+# messages, a classification call followed by a diagnosis call, with the single
+# structured-output call made by complete_general_query. Nothing leaves the machine.
+# The stub charges the same latency per call whatever the prompt, so only the round trips are measured.
+import argparse
+import asyncio
+import json
+import time
+from openai import AsyncOpenAI
+
+from backend import health_assistant
+from backend.benchmarks.bench_email import start_stub
+
+STRUCTURED_ANSWER = {
+    "category": "symptom",
+    "content": "These symptoms are often caused by a viral infection.",
+    "diagnosis": {
+        "diagnosis": "Influenza", "description": "Viral infection of the respiratory tract.",
+        "severity": "moderate", "specialty": "General Practitioner", "confidence": 0.7,
+    },
+}
+
+def completion_response(content: str) -> bytes:
+    body = json.dumps({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": "gpt-4o-2024-08-06",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }).encode()
+    return (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+    )
+
+async def legacy_general_query(client, message: str) -> dict:
+    # The two sequential calls the symptom path used to make
+    await client.chat.completions.create(
+        model="gpt-4o-2024-08-06",
+        messages=[{"role": "system", "content": "Category: [medicine/symptom/general]\nContent: [...]"}, {"role": "user", "content": message}],
+        max_tokens=500
+    )
+    await client.chat.completions.create(
+        model="gpt-4o-2024-08-06",
+        messages=[{"role": "system", "content": "Diagnosis: ...\nSeverity: ..."}, {"role": "user", "content": message}],
+        max_tokens=500
+    )
+
+async def run(label: str, query, count: int, concurrency: int, stats: dict):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await query(f"I have had a fever and a headache for {i % 7 + 1} days")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<22}{stats['requests']:>10}{p50:>10.0f}ms{p95:>10.0f}ms{count / elapsed:>12.1f}/s")
+    stats["requests"] = stats["connections"] = 0
+
+async def main(args):
+    server, base_url, stats = await start_stub(
+        args.latency_ms / 1000, response=completion_response(json.dumps(STRUCTURED_ANSWER))
+    )
+    client = AsyncOpenAI(api_key="bench-key", base_url=f"{base_url}/v1", max_retries=0)
+    health_assistant.openai_client = client
+
+    print(f"{args.queries} symptom queries, stub latency {args.latency_ms:.0f}ms per call, concurrency {args.concurrency}")
+    print(f"{'mode':<22}{'LLM calls':>10}{'p50':>12}{'p95':>12}{'throughput':>14}")
+    try:
+        await run("two calls (old)", lambda m: legacy_general_query(client, m), args.queries, args.concurrency, stats)
+        answers = []
+
+        async def structured(message):
+            answers.append(await health_assistant.complete_general_query(message))
+
+        await run("one structured call", structured, args.queries, args.concurrency, stats)
+        assert all(a["diagnosis"] and a["diagnosis"]["diagnosis"] == "Influenza" for a in answers), answers[:1]
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="General query latency: two sequential LLM calls vs one structured call")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
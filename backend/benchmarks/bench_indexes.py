@@ -0,0 +1,212 @@
+# backend/benchmarks/bench_indexes.py
+# Usage: BENCH_DATABASE_URL=postgresql://localhost/bench python -m backend.benchmarks.bench_indexes
+#
+# Seeds a throwaway schema with millions of rows, then reports EXPLAIN ANALYZE timings for the
+# hot query paths before and after migration 005_hot_path_indexes.
+import argparse
+import asyncio
+import asyncpg
+import json
+import os
+import statistics
+from dotenv import load_dotenv
+
+from backend.migration import apply_migrations
+
+load_dotenv()
+
+BENCH_SCHEMA = "bench_indexes"
+# 001 and 002 are the schema before the hot-path indexes; 003 and 004 no longer exist
+BASE_VERSION = 2
+INDEX_VERSION = 5
+# Every table migrations and seed() write to; each must resolve to the bench schema, never to public
+BENCH_TABLES = [
+    "schema_version", "users", "sessions", "messages", "reminders",
+    "reminder_history", "doctor_searches", "refresh_tokens",
+]
+
+HOT_QUERIES = {
+    "latest_session": (
+        "SELECT id, created_at FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT 1",
+        "user_id",
+    ),
+    "session_messages": (
+        "SELECT role, content FROM messages WHERE session_id = $1 ORDER BY created_at ASC",
+        "session_id",
+    ),
+    "user_reminders": (
+        "SELECT id, medicine, reminder_time, frequency, status, created_at FROM reminders WHERE user_id = $1 ORDER BY created_at DESC",
+        "user_id",
+    ),
+    "reminder_history": (
+        "SELECT * FROM reminder_history WHERE user_id = $1 ORDER BY sent_at DESC",
+        "user_id",
+    ),
+    "doctor_search_count": (
+        "SELECT COUNT(*) FROM doctor_searches WHERE user_id = $1",
+        "user_id",
+    ),
+    "refresh_lookup": (
+        "SELECT * FROM refresh_tokens WHERE token = $1 AND revoked = FALSE AND expires_at > NOW()",
+        "token",
+    ),
+}
+
+async def assert_bench_schema(conn, tables):
+    # public stays on the search_path for extension functions such as uuid_generate_v4, so make
+    # sure nothing below can fall through to the application's real tables
+    for table in tables:
+        schema = await conn.fetchval(
+            "SELECT relnamespace::regnamespace::text FROM pg_class WHERE oid = to_regclass($1)", table
+        )
+        if schema != BENCH_SCHEMA:
+            raise SystemExit(f"{table} resolves to schema {schema!r}, not {BENCH_SCHEMA}; refusing to seed")
+
+async def migrate_to(conn, version: int):
+    reached = await apply_migrations(conn, target=version)
+    if reached != version:
+        raise SystemExit(f"Asked for schema version {version} but migrations stopped at {reached}")
+
+async def seed(conn, args):
+    print(f"🌱 Seeding {args.users:,} users")
+    await conn.execute(
+        "INSERT INTO users (email, is_verified) SELECT 'bench' || g || '@example.com', TRUE FROM generate_series(1, $1) g",
+        args.users
+    )
+    await conn.execute("CREATE TEMP TABLE bench_users AS SELECT row_number() OVER () AS n, id FROM users")
+
+    print(f"🌱 Seeding {args.sessions:,} sessions")
+    await conn.execute('''
+        INSERT INTO sessions (user_id, session_name, response_format, created_at)
+        SELECT u.id, 'Session ' || g, 'Friendly Chat', NOW() - random() * INTERVAL '365 days'
+        FROM generate_series(1, $1) g JOIN bench_users u ON u.n = 1 + g % $2
+    ''', args.sessions, args.users)
+    await conn.execute("CREATE TEMP TABLE bench_sessions AS SELECT row_number() OVER () AS n, id FROM sessions")
+
+    print(f"🌱 Seeding {args.messages:,} messages")
+    await conn.execute('''
+        INSERT INTO messages (session_id, role, content, created_at)
+        SELECT s.id, CASE WHEN g % 2 = 0 THEN 'user' ELSE 'assistant' END, 'Message ' || g,
+               NOW() - random() * INTERVAL '365 days'
+        FROM generate_series(1, $1) g JOIN bench_sessions s ON s.n = 1 + g % $2
+    ''', args.messages, args.sessions)
+
+    print(f"🌱 Seeding {args.reminders:,} reminders and {args.history:,} history rows")
+    await conn.execute('''
+        INSERT INTO reminders (user_id, medicine, reminder_time, created_at)
+        SELECT u.id, 'Medicine ' || g, TIME '00:00' + (g % 1440) * INTERVAL '1 minute',
+               NOW() - random() * INTERVAL '365 days'
+        FROM generate_series(1, $1) g JOIN bench_users u ON u.n = 1 + g % $2
+    ''', args.reminders, args.users)
+    await conn.execute('''
+        INSERT INTO reminder_history (user_id, reminder_id, sent_at, delivery_status)
+        SELECT r.user_id, r.id, NOW() - random() * INTERVAL '365 days', 'email-sent'
+        FROM generate_series(1, $1) g
+        JOIN reminders r ON r.id = 1 + g % $2
+    ''', args.history, args.reminders)
+
+    print(f"🌱 Seeding {args.searches:,} doctor searches and {args.tokens:,} refresh tokens")
+    await conn.execute('''
+        INSERT INTO doctor_searches (user_id, query, specialty, location)
+        SELECT u.id, 'knee pain', 'Orthopedist', '0,0'
+        FROM generate_series(1, $1) g JOIN bench_users u ON u.n = 1 + g % $2
+    ''', args.searches, args.users)
+    await conn.execute('''
+        INSERT INTO refresh_tokens (user_id, token, expires_at, revoked)
+        SELECT u.id, md5(g::text) || md5((g * 7)::text), NOW() + (random() * 14 - 7) * INTERVAL '1 day', g % 3 = 0
+        FROM generate_series(1, $1) g JOIN bench_users u ON u.n = 1 + g % $2
+    ''', args.tokens, args.users)
+
+    await conn.execute("ANALYZE")
+
+async def sample_params(conn) -> dict:
+    user_id = await conn.fetchval("SELECT id FROM bench_users WHERE n = 42")
+    return {
+        "user_id": user_id,
+        "session_id": await conn.fetchval("SELECT id FROM sessions WHERE user_id = $1 LIMIT 1", user_id),
+        "token": await conn.fetchval(
+            "SELECT token FROM refresh_tokens WHERE revoked = FALSE AND expires_at > NOW() LIMIT 1"
+        ),
+    }
+
+async def measure(conn, params: dict, runs: int) -> dict:
+    results = {}
+    for name, (sql, param) in HOT_QUERIES.items():
+        timings = []
+        plan_root = None
+        for _ in range(runs):
+            raw = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params[param])
+            plan = json.loads(raw)[0]
+            timings.append(plan["Execution Time"])
+            plan_root = plan["Plan"]
+        results[name] = (statistics.median(timings), describe_plan(plan_root))
+    return results
+
+def describe_plan(node: dict) -> str:
+    # Report the scan that actually touches the table, e.g. "Seq Scan" vs "Index Scan"
+    while node.get("Plans") and "Scan" not in node["Node Type"]:
+        node = node["Plans"][0]
+    return node["Node Type"]
+
+def print_report(before: dict, after: dict):
+    print()
+    print(f"{'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}   plan")
+    for name in HOT_QUERIES:
+        b_ms, b_plan = before[name]
+        a_ms, a_plan = after[name]
+        speedup = b_ms / a_ms if a_ms else float("inf")
+        print(f"{name:<22}{b_ms:>12.3f}{a_ms:>12.3f}{speedup:>9.1f}x   {b_plan} -> {a_plan}")
+
+async def main(args):
+    if not args.dsn:
+        raise SystemExit("Set BENCH_DATABASE_URL or pass --dsn; this benchmark must not run against production")
+
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        await conn.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+        # apply_migrations reads an unqualified schema_version; without this one it would find
+        # public.schema_version on an already-migrated database and apply nothing
+        await conn.execute(f'''
+            CREATE TABLE {BENCH_SCHEMA}.schema_version (
+                version INT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await assert_bench_schema(conn, ["schema_version"])
+
+        await migrate_to(conn, BASE_VERSION)
+        await assert_bench_schema(conn, BENCH_TABLES)
+        await seed(conn, args)
+        params = await sample_params(conn)
+
+        print("⏱️  Measuring without hot-path indexes")
+        before = await measure(conn, params, args.runs)
+
+        print("🛠️  Applying hot-path index migration")
+        await migrate_to(conn, INDEX_VERSION)
+        await conn.execute("ANALYZE")
+
+        print("⏱️  Measuring with hot-path indexes")
+        after = await measure(conn, params, args.runs)
+        print_report(before, after)
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the hot query paths before/after the index migration")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, default=2_000_000)
+    parser.add_argument("--messages", type=int, default=6_000_000)
+    parser.add_argument("--reminders", type=int, default=500_000)
+    parser.add_argument("--history", type=int, default=3_000_000)
+    parser.add_argument("--searches", type=int, default=500_000)
+    parser.add_argument("--tokens", type=int, default=2_000_000)
+    parser.add_argument("--runs", type=int, default=5, help="EXPLAIN ANALYZE repetitions per query (median is reported)")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {BENCH_SCHEMA} schema for inspection")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+# backend/benchmarks/bench_reminder_fanout.py
+# Usage: python -m backend.benchmarks.bench_reminder_fanout --reminders 2000 --latency-ms 5 --workers 16
+#
+# Runs the real reminder Celery tasks on an in-process worker with the in-memory broker and
+# result backend. It compares three ways of draining a slot:
+# - one task sending one reminder at a time, as the old check_reminders did;
+# - one task sending REMINDER_SEND_CONCURRENCY reminders at once on the worker's event loop;
+# - check_reminders' sharded chord fan-out.
+# The database and the email provider are replaced by in-memory fakes with a fixed per-send
+# latency, so only the dispatch strategy is measured.
+import argparse
+import asyncio
+import time
+from celery.contrib.testing.worker import start_worker
+from celery.result import AsyncResult
+
+from backend.tasks import tasks
+from backend.utils.email import EmailResult
+
+def install_fakes(reminder_count: int, latency: float, shards: int):
+    rows = {
+        i: {
+            "id": i, "user_id": f"user-{i % (reminder_count // 3 + 1)}", "medicine": f"Medicine {i}",
+            "reminder_time": "08:00", "user_found": True, "email": f"user{i}@example.com",
+            "phone": None, "preferred_notification": "email", "already_sent": False,
+        }
+        for i in range(reminder_count)
+    }
+    claimed = set()
+
+    async def get_due_reminder_shards(limit, shard_count):
+        due = [i for i in rows if i not in claimed][:limit]
+        return [{"id": i, "shard": hash(rows[i]["user_id"]) % shard_count} for i in due]
+
+    async def claim_reminders_by_id(reminder_ids, grace_seconds):
+        fresh = [i for i in reminder_ids if i not in claimed]
+        claimed.update(fresh)
+        return [rows[i] for i in fresh]
+
+    async def log_reminder_history_batch(entries):
+        pass
+
+    async def get_reminder_run_state():
+        return {"now": time.time(), "lag_seconds": None}
+
+    async def advance_reminder_watermark(caught_up_at):
+        pass
+
+    class FakeEmailClient:
+        async def send(self, to_email, subject, body):
+            await asyncio.sleep(latency)
+            return EmailResult(to_email, True, 202)
+
+    email_client = FakeEmailClient()
+    tasks.get_due_reminder_shards = get_due_reminder_shards
+    tasks.claim_reminders_by_id = claim_reminders_by_id
+    tasks.log_reminder_history_batch = log_reminder_history_batch
+    tasks.get_reminder_run_state = get_reminder_run_state
+    tasks.advance_reminder_watermark = advance_reminder_watermark
+    tasks.get_email_client = lambda: email_client
+    tasks.REMINDER_SHARDS = shards
+    return rows, claimed
+
+def main(args):
+    app = tasks.celery
+    app.conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        # The memory transport otherwise polls its queues once a second
+        broker_transport_options={"polling_interval": 0.01},
+        # Chords on a non-Redis backend poll for completion; keep the poll out of the timings
+        result_chord_retry_interval=0.05,
+    )
+    rows, claimed = install_fakes(args.reminders, args.latency_ms / 1000, args.shards)
+    tasks.REMINDER_CHUNK_SIZE = args.chunk_size
+
+    print(
+        f"{args.reminders} reminders, {args.latency_ms:g}ms per send, {args.workers} worker threads, "
+        f"send concurrency {args.send_concurrency}"
+    )
+    print(f"{'mode':<20}{'chunks':>8}{'elapsed':>11}{'throughput':>14}")
+    with start_worker(app, pool="threads", concurrency=args.workers, perform_ping_check=False, loglevel="WARNING"):
+        for label, concurrency in (("one at a time", 1), ("single task", args.send_concurrency)):
+            claimed.clear()
+            tasks.REMINDER_SEND_CONCURRENCY = concurrency
+            started = time.perf_counter()
+            tasks.deliver_reminder_chunk.delay(list(rows)).get(timeout=3600)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<20}{1:>8}{elapsed:>10.2f}s{args.reminders / elapsed:>12.1f}/s")
+
+        claimed.clear()
+        started = time.perf_counter()
+        summary_id = tasks.check_reminders.delay().get(timeout=60)
+        summary = AsyncResult(summary_id, app=app).get(timeout=3600)
+        elapsed = time.perf_counter() - started
+        chunks = len(tasks.build_reminder_chunks(
+            [{"id": i, "shard": hash(r["user_id"]) % args.shards} for i, r in rows.items()], args.chunk_size
+        ))
+        print(f"{'sharded chord':<20}{chunks:>8}{elapsed:>10.2f}s{args.reminders / elapsed:>12.1f}/s")
+        assert sum(summary["statuses"].values()) == args.reminders, summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs sharded chord reminder delivery on an in-memory broker")
+    parser.add_argument("--reminders", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=tasks.REMINDER_CHUNK_SIZE)
+    parser.add_argument("--send-concurrency", type=int, default=tasks.REMINDER_SEND_CONCURRENCY)
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_sms.py
+# Usage: python -m backend.benchmarks.bench_sms --messages 1000 --latency-ms 150 --workers 32
+#
+# Points the shared Twilio client at a local fake Messages endpoint and compares sending one
+# SMS at a time (the old reminder loop) with send_many_sms on the worker pool.
+import argparse
+import asyncio
+import json
+import time
+
+from backend.benchmarks.bench_email import report, start_stub
+from backend.utils import sms as sms_utils
+
+def twilio_created_response() -> bytes:
+    body = json.dumps({"sid": "SMbench", "status": "queued"}).encode()
+    return (
+        b"HTTP/1.1 201 Created\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+
+async def main(args):
+    server, base_url, stats = await start_stub(args.latency_ms / 1000, twilio_created_response())
+
+    # Configure the module before the shared client and worker pool are created
+    sms_utils.TWILIO_API_BASE_URL = base_url
+    sms_utils.TWILIO_ACCOUNT_SID = "ACbench"
+    sms_utils.TWILIO_AUTH_TOKEN = "bench-token"
+    sms_utils.TWILIO_PHONE_NUMBER = "+15550000000"
+    if args.workers:
+        sms_utils.SMS_WORKERS = args.workers
+    messages = [(f"+1555{i:07d}", f"💊 Reminder: Take Medicine {i} at 08:00") for i in range(args.messages)]
+
+    print(f"fake Twilio latency {args.latency_ms:.0f}ms, workers {sms_utils.SMS_WORKERS}")
+    print(f"{'mode':<22}{'messages':>9}{'elapsed':>12}{'throughput':>14}{'connections':>13}")
+    try:
+        sequential = messages[:args.sequential]
+        started = time.perf_counter()
+        for message in sequential:
+            result = await asyncio.to_thread(sms_utils.send_sms_notification, *message)
+            assert result.ok, result.error
+        report("sequential", len(sequential), time.perf_counter() - started, stats)
+
+        started = time.perf_counter()
+        results = await sms_utils.send_many_sms(messages)
+        elapsed = time.perf_counter() - started
+        assert all(result.ok for result in results), [r.error for r in results if not r.ok][:3]
+        report("send_many_sms", len(messages), elapsed, stats)
+    finally:
+        sms_utils.get_twilio_client().http_client.session.close()
+        server.close()
+        await server.wait_closed()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SMS send throughput against a local fake Twilio endpoint")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--sequential", type=int, default=40, help="How many messages the one-at-a-time baseline sends")
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--workers", type=int, default=None, help="Override SMS_WORKERS")
+    asyncio.run(main(parser.parse_args()))
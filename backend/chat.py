@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from typing import List, Optional
 from backend.auth import User, get_current_user
  
-from backend.database import get_db_connection
+from backend.database import get_connection
 import uuid
 from datetime import datetime
 
@@ -41,15 +41,12 @@ async def create_session(current_user: User = Depends(get_current_user)):
     session_id = str(uuid.uuid4())
     created_at = datetime.utcnow()
 
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         await conn.execute(
             "INSERT INTO chat_sessions (session_id, user_id, created_at) VALUES ($1, $2, $3)",
             session_id, current_user.id, created_at
         )
         return ChatSession(session_id=session_id, user_id=current_user.id, created_at=created_at)
-    finally:
-        await conn.close()
 
 # Endpoint to get all chat sessions for the current user
 @router.get("/sessions", response_model=List[ChatSession])
@@ -57,8 +54,7 @@ async def get_sessions(current_user: User = Depends(get_current_user)):
     if not current_user.id:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         # Fetch all sessions for the user
         sessions = await conn.fetch(
             "SELECT session_id, user_id, created_at FROM chat_sessions WHERE user_id = $1",
@@ -90,8 +86,6 @@ async def get_sessions(current_user: User = Depends(get_current_user)):
                 )
             )
         return result
-    finally:
-        await conn.close()
 
 # Endpoint to send a message in a chat session
 @router.post("/{session_id}/message", response_model=ChatResponse)
@@ -100,8 +94,7 @@ async def chat(session_id: str, request: ChatRequest, current_user: User = Depen
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     # Verify the session exists and belongs to the user
-    conn = await get_db_connection()
-    try:
+    async with get_connection() as conn:
         session = await conn.fetchrow(
             "SELECT session_id, user_id FROM chat_sessions WHERE session_id = $1 AND user_id = $2",
             session_id, current_user.id
@@ -127,6 +120,4 @@ async def chat(session_id: str, request: ChatRequest, current_user: User = Depen
             message=request.message,
             response=bot_response,
             timestamp=timestamp
-        )
-    finally:
-        await conn.close()
\ No newline at end of file
+        )
\ No newline at end of file
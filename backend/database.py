@@ -1,124 +1,214 @@
 import asyncpg
+import asyncio
+from contextlib import asynccontextmanager
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import os
+import time
 import logging
 
+from backend.migration import apply_migrations
+from backend.db_metrics import InstrumentedConnection
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional streaming replica for read-only endpoints; unset means every read goes to the primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 5))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 20))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 10))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", 300))
+# Large enough that ad hoc SQL never evicts the registered hot statements
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))
+
+# After a user writes, their reads stay on the primary for this long so replica lag
+# never hides their own changes
+READ_YOUR_WRITES_WINDOW = float(os.getenv("DB_READ_YOUR_WRITES_WINDOW", 5))
+# Shares the recent-write markers between API workers; without it a write is only seen by
+# the process that made it, and the user's next read may land on another one
+READ_YOUR_WRITES_REDIS_URL = os.getenv("DB_READ_YOUR_WRITES_REDIS_URL")
+READ_YOUR_WRITES_KEY_PREFIX = "db:wrote:"
 
 logger = logging.getLogger(__name__)
 
+_pools = {}
+_pool_lock = asyncio.Lock()
+_recent_writers = TTLCache(maxsize=100_000, ttl=READ_YOUR_WRITES_WINDOW)
+_redis = None
+
+def _get_redis():
+    global _redis
+    if READ_YOUR_WRITES_REDIS_URL and _redis is None:
+        import redis.asyncio as redis
+        _redis = redis.from_url(READ_YOUR_WRITES_REDIS_URL, decode_responses=True)
+    return _redis
+
+def _new_pool_metrics() -> dict:
+    return {
+        "acquired": 0,
+        "waiting": 0,
+        "max_waiting": 0,
+        "timeouts": 0,
+        "total_wait_ms": 0.0,
+        "max_wait_ms": 0.0,
+    }
+
+# Saturation counters per pool, reported by get_pool_stats()
+_pool_metrics = {"primary": _new_pool_metrics(), "replica": _new_pool_metrics()}
+
+async def _create_pool(dsn: str):
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+    )
+
+async def init_pool():
+    """Create the shared connection pools. Safe to call more than once."""
+    async with _pool_lock:
+        if "primary" not in _pools:
+            _pools["primary"] = await _create_pool(DATABASE_URL)
+            logger.info(f"✅ Database pool created (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+        if DATABASE_REPLICA_URL and "replica" not in _pools:
+            _pools["replica"] = await _create_pool(DATABASE_REPLICA_URL)
+            logger.info("✅ Replica pool created")
+            if not READ_YOUR_WRITES_REDIS_URL:
+                logger.warning(
+                    "DATABASE_REPLICA_URL is set without DB_READ_YOUR_WRITES_REDIS_URL: a user's write only "
+                    "pins their reads to the primary in the worker that made it. Set it or run a single worker."
+                )
+    return _pools["primary"]
+
+async def close_pool():
+    async with _pool_lock:
+        for name in list(_pools):
+            await _pools.pop(name).close()
+            logger.info(f"✅ Database {name} pool closed")
+
+async def get_pool():
+    # Lazily create the pool for processes that never ran the FastAPI startup hook (e.g. Celery)
+    if "primary" not in _pools:
+        return await init_pool()
+    return _pools["primary"]
+
+@asynccontextmanager
+async def _acquire(name: str):
+    pool = _pools[name]
+    metrics = _pool_metrics[name]
+    metrics["waiting"] += 1
+    metrics["max_waiting"] = max(metrics["max_waiting"], metrics["waiting"])
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics["timeouts"] += 1
+        logger.error(f"❌ Timed out after {DB_POOL_ACQUIRE_TIMEOUT}s waiting for a {name} database connection")
+        raise
+    finally:
+        metrics["waiting"] -= 1
+
+    wait_ms = (time.perf_counter() - started) * 1000
+    metrics["acquired"] += 1
+    metrics["total_wait_ms"] += wait_ms
+    metrics["max_wait_ms"] = max(metrics["max_wait_ms"], wait_ms)
+    try:
+        yield InstrumentedConnection(conn)
+    finally:
+        await pool.release(conn)
+
+@asynccontextmanager
+async def get_connection():
+    """Acquire a pooled, instrumented primary connection and release it when the block exits."""
+    await get_pool()
+    async with _acquire("primary") as conn:
+        yield conn
+
+@asynccontextmanager
+async def get_read_connection(user_id=None):
+    """
+    Acquire a connection for read-only work. Served by the replica when one is configured,
+    unless `user_id` wrote within READ_YOUR_WRITES_WINDOW (see mark_user_write).
+    """
+    await get_pool()
+    use_replica = "replica" in _pools and (user_id is None or not await _wrote_recently(user_id))
+    async with _acquire("replica" if use_replica else "primary") as conn:
+        yield conn
+
+async def _wrote_recently(user_id) -> bool:
+    key = str(user_id)
+    if key in _recent_writers:
+        return True
+    client = _get_redis()
+    if client is None:
+        return False
+    try:
+        return bool(await client.exists(f"{READ_YOUR_WRITES_KEY_PREFIX}{key}"))
+    except Exception as e:
+        # Can't tell, so don't risk a stale read
+        logger.warning(f"Read-your-writes Redis lookup failed: {str(e)}")
+        return True
+
+async def mark_user_write(user_id):
+    """
+    Pin the user's reads to the primary for the read-your-writes window. Call it once the
+    write has committed; with DB_READ_YOUR_WRITES_REDIS_URL every worker sees the marker.
+    """
+    if user_id is None:
+        return
+    key = str(user_id)
+    _recent_writers[key] = True
+    client = _get_redis()
+    if client is not None:
+        try:
+            await client.set(f"{READ_YOUR_WRITES_KEY_PREFIX}{key}", 1, px=int(READ_YOUR_WRITES_WINDOW * 1000))
+        except Exception as e:
+            logger.warning(f"Read-your-writes Redis write failed: {str(e)}")
+
+def _pool_stats(name: str) -> dict:
+    metrics = _pool_metrics[name]
+    acquired = metrics["acquired"]
+    stats = {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "size": 0,
+        "idle": 0,
+        "in_use": 0,
+        "waiting": metrics["waiting"],
+        "max_waiting": metrics["max_waiting"],
+        "acquired": acquired,
+        "timeouts": metrics["timeouts"],
+        "avg_wait_ms": round(metrics["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+        "max_wait_ms": round(metrics["max_wait_ms"], 3),
+    }
+    pool = _pools.get(name)
+    if pool is not None:
+        stats["size"] = pool.get_size()
+        stats["idle"] = pool.get_idle_size()
+        stats["in_use"] = stats["size"] - stats["idle"]
+    stats["saturation"] = round(stats["in_use"] / DB_POOL_MAX_SIZE, 3) if DB_POOL_MAX_SIZE else 0.0
+    return stats
+
+def get_pool_stats() -> dict:
+    stats = {"primary": _pool_stats("primary")}
+    if DATABASE_REPLICA_URL:
+        stats["replica"] = _pool_stats("replica")
+    return stats
+
 async def init_db():
+    # Runs on its own connection before the pool opens, so no pooled connection ever
+    # caches a statement planned against the pre-migration schema.
+    # Only pending migrations run; an up-to-date schema costs a single version check.
     try:
         conn = await asyncpg.connect(DATABASE_URL)
-
-        # Ensure uuid extension is enabled
-        await conn.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp";')
-
-        await conn.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    email TEXT UNIQUE NOT NULL,
-    password TEXT,
-    role TEXT DEFAULT 'user',
-    auth_provider TEXT DEFAULT 'email',
-    is_verified BOOLEAN DEFAULT FALSE, 
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-
-        CREATE TABLE IF NOT EXISTS sessions (
-            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
-            session_name TEXT NOT NULL,
-            response_format TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS messages (
-            id SERIAL PRIMARY KEY,
-            session_id UUID REFERENCES sessions(id) ON DELETE CASCADE,
-            role TEXT NOT NULL,
-            content TEXT NOT NULL,
-            image_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS doctor_searches (
-            id SERIAL PRIMARY KEY,
-            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
-            query TEXT NOT NULL,
-            specialty TEXT NOT NULL,
-            location TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS feedback (
-            id SERIAL PRIMARY KEY,
-            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
-            message TEXT NOT NULL,
-            specialty TEXT NOT NULL,
-            feedback TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS medicines (
-            id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL,
-            country TEXT NOT NULL,
-            condition TEXT NOT NULL,
-            usage TEXT,
-            overdose_effects TEXT,
-            is_otc BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS otc_sources (
-            id SERIAL PRIMARY KEY,
-            country TEXT NOT NULL,
-            url TEXT NOT NULL,
-            selector TEXT NOT NULL,
-            name_field TEXT NOT NULL,
-            condition_field TEXT NOT NULL,
-            active BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE (country, url)
-        );
-
-        CREATE TABLE IF NOT EXISTS reminders (
-            id SERIAL PRIMARY KEY,
-            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
-            medicine TEXT NOT NULL,
-            reminder_time TIME NOT NULL,
-            frequency TEXT DEFAULT 'daily',
-            status TEXT DEFAULT 'active',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS refresh_tokens (
-            id SERIAL PRIMARY KEY,
-            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
-            token TEXT NOT NULL UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP NOT NULL,
-            revoked BOOLEAN DEFAULT FALSE
-        );
-
-        CREATE TABLE IF NOT EXISTS reminder_history (
-            id SERIAL PRIMARY KEY,
-            user_id UUID NOT NULL,
-            reminder_id INT NOT NULL REFERENCES reminders(id) ON DELETE CASCADE,
-            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            delivery_status TEXT DEFAULT 'pending'
-        );
-        
-        ''')
-        logger.info("✅ Database tables initialized successfully")
-        await conn.close()
+        try:
+            version = await apply_migrations(conn)
+        finally:
+            await conn.close()
+        logger.info(f"✅ Database schema at version {version}")
     except Exception as e:
         logger.error(f"❌ Database initialization error: {str(e)}")
         raise
-
-# ✅ Required by dependencies
-async def get_db_connection():
-    return await asyncpg.connect(DATABASE_URL)
@@ -0,0 +1,127 @@
+# backend/db_metrics.py
+# Latency histograms per query label and a slow-query log for every statement that goes
+# through the connections handed out by backend.database.
+import os
+import re
+import time
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+
+# Histogram bucket upper bounds (ms); anything slower lands in the overflow bucket
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+logger = logging.getLogger(__name__)
+
+_histograms = {}
+
+_VERB_PATTERN = re.compile(r"^\s*(\w+)")
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+([\w.]+)", re.IGNORECASE)
+
+def query_label(sql: str) -> str:
+    """Derive a stable label such as "SELECT sessions" for SQL without an explicit name."""
+    verb_match = _VERB_PATTERN.match(sql)
+    verb = verb_match.group(1).upper() if verb_match else "SQL"
+    table_match = _TABLE_PATTERN.search(sql)
+    return f"{verb} {table_match.group(1)}" if table_match else verb
+
+def param_shape(args) -> list:
+    # Types and sizes only: bound values can hold emails, tokens and health data
+    shape = []
+    for arg in args:
+        if isinstance(arg, (str, bytes, list, tuple)):
+            shape.append(f"{type(arg).__name__}({len(arg)})")
+        else:
+            shape.append(type(arg).__name__)
+    return shape
+
+def record(label: str, sql: str, args, elapsed_ms: float, rows: int = None):
+    hist = _histograms.get(label)
+    if hist is None:
+        hist = _histograms[label] = {
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        }
+    hist["count"] += 1
+    hist["total_ms"] += elapsed_ms
+    hist["max_ms"] = max(hist["max_ms"], elapsed_ms)
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if elapsed_ms <= bound:
+            hist["buckets"][i] += 1
+            break
+    else:
+        hist["buckets"][-1] += 1
+
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        shape = f"{rows} rows x {param_shape(args[0]) if args else []}" if rows is not None else param_shape(args)
+        logger.warning(
+            f"🐢 Slow query [{label}] {elapsed_ms:.1f}ms params={shape} sql={' '.join(sql.split())[:300]}"
+        )
+
+def _percentile(hist: dict, q: float) -> float:
+    target = q * hist["count"]
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS, hist["buckets"]):
+        seen += count
+        if seen >= target:
+            return float(bound)
+    return round(hist["max_ms"], 3)
+
+def get_query_metrics() -> dict:
+    metrics = {}
+    for label, hist in sorted(_histograms.items(), key=lambda item: -item[1]["total_ms"]):
+        metrics[label] = {
+            "count": hist["count"],
+            "avg_ms": round(hist["total_ms"] / hist["count"], 3),
+            "max_ms": round(hist["max_ms"], 3),
+            "p50_ms": _percentile(hist, 0.50),
+            "p95_ms": _percentile(hist, 0.95),
+            "p99_ms": _percentile(hist, 0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, hist["buckets"])},
+                "overflow": hist["buckets"][-1],
+            },
+        }
+    return metrics
+
+class InstrumentedConnection:
+    """Times fetch/fetchrow/fetchval/execute/executemany; everything else passes straight through."""
+
+    __slots__ = ("raw_connection",)
+
+    def __init__(self, conn):
+        self.raw_connection = conn
+
+    def __getattr__(self, name):
+        return getattr(self.raw_connection, name)
+
+    async def _timed(self, method, sql: str, args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(sql, *args, **kwargs)
+        finally:
+            record(query_label(sql), sql, args, (time.perf_counter() - started) * 1000)
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self._timed(self.raw_connection.fetch, query, args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self._timed(self.raw_connection.fetchrow, query, args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self._timed(self.raw_connection.fetchval, query, args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        return await self._timed(self.raw_connection.execute, query, args, **kwargs)
+
+    async def executemany(self, command, args, **kwargs):
+        args = list(args)
+        started = time.perf_counter()
+        try:
+            return await self.raw_connection.executemany(command, args, **kwargs)
+        finally:
+            record(query_label(command), command, args, (time.perf_counter() - started) * 1000, rows=len(args))
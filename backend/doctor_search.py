@@ -11,7 +11,7 @@ import os
 from datetime import datetime
 from backend.auth.schemas import User
 from backend.auth.auth import get_current_user
-from backend.database import get_db_connection
+from backend.database import get_connection
 
 load_dotenv()
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
@@ -158,63 +158,61 @@ async def fetch_doctors(specialty: str, latitude: float, longitude: float, all_r
 # Existing doctor search function (used by health assistant)
 async def search_doctor(request: DoctorSearchRequest, current_user: User = Depends(get_current_user)):
     user_id = str(current_user.id) if current_user.id else "anonymous"  # Convert UUID to string
-    conn = await get_db_connection()
-    try:
-        # Check search limit for anonymous users
-        if user_id == "anonymous":
+    # Check search limit for anonymous users
+    if user_id == "anonymous":
+        async with get_connection() as conn:
             count = await conn.fetchval(
                 "SELECT COUNT(*) FROM doctor_searches WHERE user_id = $1", user_id
             )
-            if count >= 2:
-                raise HTTPException(status_code=403, detail="Please log in after 2 searches.")
+        if count >= 2:
+            raise HTTPException(status_code=403, detail="Please log in after 2 searches.")
 
-        # Determine specialty based on query
-        specialty = fuzzy_specialty_match(request.query)
+    # Determine specialty based on query
+    specialty = fuzzy_specialty_match(request.query)
 
-        # Determine location
-        if request.latitude is not None and request.longitude is not None:
-            latitude, longitude = request.latitude, request.longitude
-        elif request.location:
-            latitude, longitude = await geocode_location(request.location)
-        else:
-            latitude, longitude = await get_user_location()
+    # Determine location
+    if request.latitude is not None and request.longitude is not None:
+        latitude, longitude = request.latitude, request.longitude
+    elif request.location:
+        latitude, longitude = await geocode_location(request.location)
+    else:
+        latitude, longitude = await get_user_location()
 
-        # Fetch doctors - always get all results
-        doctors = await fetch_doctors(specialty, latitude, longitude, all_results=True)
-        total = len(doctors)
+    # Fetch doctors - always get all results
+    doctors = await fetch_doctors(specialty, latitude, longitude, all_results=True)
+    total = len(doctors)
 
-        # Apply pagination if not from health assistant
-        if not request.from_health_assistant:
-            page, page_size = get_safe_pagination(
-                getattr(request, "page", 1),
-                getattr(request, "page_size", 100)  # Changed from 5 to 100
-            )
-            start = (page - 1) * page_size
-            end = start + page_size
-            paginated_doctors = doctors[start:end]
-        else:
-            paginated_doctors = doctors
-            page = page_size = None
+    # Apply pagination if not from health assistant
+    if not request.from_health_assistant:
+        page, page_size = get_safe_pagination(
+            getattr(request, "page", 1),
+            getattr(request, "page_size", 100)  # Changed from 5 to 100
+        )
+        start = (page - 1) * page_size
+        end = start + page_size
+        paginated_doctors = doctors[start:end]
+    else:
+        paginated_doctors = doctors
+        page = page_size = None
 
-        # Log the search in the database
+    # Log the search in the database
+    async with get_connection() as conn:
         await conn.execute(
             "INSERT INTO doctor_searches (user_id, query, specialty, location, created_at) "
             "VALUES ($1, $2, $3, $4, $5)",
             user_id, request.query, specialty, f"{latitude},{longitude}", datetime.utcnow()
         )
 
-        return {
-            "specialty": specialty,
-            "doctors": paginated_doctors,
-            "pagination": None if request.from_health_assistant else {
-                "current_page": page,
-                "page_size": page_size,
-                "total_items": total,
-                "total_pages": (total + page_size - 1) // page_size if page_size else 0
-            }
+    return {
+        "specialty": specialty,
+        "doctors": paginated_doctors,
+        "pagination": None if request.from_health_assistant else {
+            "current_page": page,
+            "page_size": page_size,
+            "total_items": total,
+            "total_pages": (total + page_size - 1) // page_size if page_size else 0
         }
-    finally:
-        await conn.close()
+    }
 
 # Endpoint for searching doctors with pagination (POST)
 @router.post("/search-doctor")
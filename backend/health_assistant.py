@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List
-from backend.database import get_db_connection
+from backend.database import get_connection, get_read_connection, mark_user_write
+from backend import queries
 from openai import AsyncOpenAI
 import uuid
 from datetime import datetime, timezone
@@ -13,10 +16,13 @@ from backend.auth.schemas import User
 from backend.auth.auth import get_current_user
 import re
 from backend.doctor_search import fetch_doctors
+from backend import symptom_cache
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Part of the symptom cache key; bump it whenever the analyze_symptoms prompt or model changes
+SYMPTOM_PROMPT_VERSION = os.getenv("SYMPTOM_PROMPT_VERSION", "1")
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -68,151 +74,370 @@ def is_session_expired(created_at: datetime, minutes: int = 60) -> bool:
     now = datetime.now(timezone.utc)
     return (now - created_at).total_seconds() > minutes * 60
 
-async def analyze_symptoms(symptoms: List[str], user: User) -> dict:
+async def get_or_create_session(conn, user_id: str, session_name: str, response_format: str, force_new: bool = False) -> str:
+    existing_session = None
+    if not force_new:
+        existing_session = await queries.fetchrow(conn, "latest_session", user_id)
+
+    if existing_session and not is_session_expired(existing_session["created_at"]):
+        session_id = str(existing_session["id"])
+        logger.info(f"Reusing session: {session_id}")
+    else:
+        session_id = str(uuid.uuid4())
+        await queries.execute(
+            conn, "insert_session",
+            session_id, user_id, session_name, response_format, datetime.utcnow()
+        )
+        # Committed already; the LLM call that follows can take longer than replica lag
+        await mark_user_write(user_id)
+        logger.info(f"Created new session: {session_id}")
+    return session_id
+
+async def save_exchange(conn, session_id: str, user_content: str, assistant_content: str):
+    await queries.executemany(
+        conn, "insert_message",
+        [
+            (session_id, "user", user_content, datetime.utcnow()),
+            (session_id, "assistant", assistant_content, datetime.utcnow()),
+        ]
+    )
+
+SYMPTOM_PROMPT = "You are a medical diagnostic expert. Provide a structured diagnosis based on symptoms in the format: Diagnosis: [text]\nDescription: [text]\nSeverity: [low/moderate/high]\nSpecialty: [text]\nConfidence: [0-1]."
+
+def _symptom_messages(symptoms: List[str]) -> list:
+    return [
+        {"role": "system", "content": SYMPTOM_PROMPT},
+        {"role": "user", "content": f"Symptoms: {', '.join(symptoms)}"}
+    ]
+
+def parse_symptom_analysis(text: str) -> dict:
+    lines = text.strip().split("\n")
+    diagnosis = lines[0].replace("Diagnosis: ", "") if "Diagnosis" in lines[0] else "Possible condition unclear"
+    description = next((l for l in lines if "Description" in l), "Description: Further evaluation needed").replace("Description: ", "")
+    severity = next((l for l in lines if "Severity" in l), "Severity: moderate").replace("Severity: ", "")
+    specialty = next((l for l in lines if "Specialty" in l), "Specialty: General Practitioner").replace("Specialty: ", "")
+    confidence = float(next((l for l in lines if "Confidence" in l), "Confidence: 0.5").replace("Confidence: ", ""))
+    return HealthResponse(diagnosis=diagnosis, description=description, severity=severity, recommended_speciality=specialty, confidence=confidence).dict()
+
+async def _complete_symptom_analysis(symptoms: List[str]) -> dict:
+    response = await openai_client.chat.completions.create(
+        model="gpt-4o-2024-08-06",
+        messages=_symptom_messages(symptoms),
+        max_tokens=500
+    )
+    return parse_symptom_analysis(response.choices[0].message.content)
+
+def _validate_symptoms(symptoms: List[str]):
     if not symptoms or not all(isinstance(s, str) and s.strip() for s in symptoms):
         raise HTTPException(status_code=422, detail="Symptoms must be a non-empty list of non-empty strings")
-    
+
+async def _symptom_doctor_suggestions(health_data: HealthResponse) -> list:
+    if health_data.severity.lower() != "high":
+        return []
+    try:
+        lat, lon = await get_user_location()
+        return await fetch_doctors(
+            specialty=health_data.recommended_speciality,
+            latitude=lat,
+            longitude=lon,
+            all_results=True
+        )
+    except Exception as e:
+        logger.warning(f"Failed to fetch doctors: {str(e)}")
+        return []
+
+async def analyze_symptoms(symptoms: List[str], user: User) -> dict:
+    _validate_symptoms(symptoms)
+
+    # The same symptoms in any order or casing share one completion
+    normalized = symptom_cache.normalize_symptoms(symptoms)
+    cached = await symptom_cache.get_or_compute(
+        symptom_cache.cache_key(normalized, SYMPTOM_PROMPT_VERSION),
+        lambda: _complete_symptom_analysis(normalized)
+    )
+    health_data = HealthResponse(**cached)
+    return {
+        "diagnosis": health_data,
+        "suggested_doctors": await _symptom_doctor_suggestions(health_data)
+    }
+
+def _symptom_exchange(symptoms: List[str], health_data: HealthResponse) -> tuple:
+    return (
+        f"Symptoms: {', '.join(symptoms)}",
+        f"Diagnosis: {health_data.diagnosis}\nDescription: {health_data.description}\nSeverity: {health_data.severity}\nRecommended Specialty: {health_data.recommended_speciality}\nConfidence: {health_data.confidence}"
+    )
+
+# One structured-output call classifies the message and, for symptoms, returns the diagnosis too
+GENERAL_QUERY_PROMPT = (
+    "You are a health assistant. Determine if the message is about a medicine, symptoms, or something else, "
+    "and give a helpful answer in content. If it's a medicine, include common usage and dosage. "
+    "If it describes symptoms, also fill in diagnosis; otherwise set diagnosis to null."
+)
+
+GENERAL_QUERY_SCHEMA = {
+    "name": "general_query_answer",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "properties": {
+            "category": {"type": "string", "enum": ["medicine", "symptom", "general"]},
+            "content": {"type": "string"},
+            "diagnosis": {
+                "anyOf": [
+                    {"type": "null"},
+                    {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "diagnosis": {"type": "string"},
+                            "description": {"type": "string"},
+                            "severity": {"type": "string", "enum": ["low", "moderate", "high"]},
+                            "specialty": {"type": "string"},
+                            "confidence": {"type": "number"},
+                        },
+                        "required": ["diagnosis", "description", "severity", "specialty", "confidence"],
+                    },
+                ]
+            },
+        },
+        "required": ["category", "content", "diagnosis"],
+    },
+}
+
+def parse_general_query_answer(text: str) -> dict:
+    """Parse the structured answer into {"category", "content", "diagnosis"}; diagnosis is None unless category is symptom."""
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```(?:json)?|```$", "", text).strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        # Not JSON after all: show whatever came back as a general answer
+        return {"category": "general", "content": text or "Unable to understand", "diagnosis": None}
+
+    category = str(data.get("category") or "general").strip().lower()
+    if category not in ("medicine", "symptom", "general"):
+        category = "general"
+    content = str(data.get("content") or "").strip() or "Unable to understand"
+
+    raw = data.get("diagnosis")
+    diagnosis = None
+    if category == "symptom" and isinstance(raw, dict):
+        severity = str(raw.get("severity") or "moderate").strip().lower()
+        try:
+            confidence = min(max(float(raw.get("confidence", 0.5)), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = 0.5
+        diagnosis = {
+            "diagnosis": str(raw.get("diagnosis") or "Unknown").strip(),
+            "description": str(raw.get("description") or "No description.").strip(),
+            "severity": severity if severity in ("low", "moderate", "high") else "moderate",
+            "specialty": str(raw.get("specialty") or "General Practitioner").strip(),
+            "confidence": confidence,
+        }
+    return {"category": category, "content": content, "diagnosis": diagnosis}
+
+async def complete_general_query(message: str) -> dict:
     response = await openai_client.chat.completions.create(
         model="gpt-4o-2024-08-06",
         messages=[
-            {"role": "system", "content": "You are a medical diagnostic expert. Provide a structured diagnosis based on symptoms in the format: Diagnosis: [text]\nDescription: [text]\nSeverity: [low/moderate/high]\nSpecialty: [text]\nConfidence: [0-1]."},
-            {"role": "user", "content": f"Symptoms: {', '.join(symptoms)}"}
+            {"role": "system", "content": GENERAL_QUERY_PROMPT},
+            {"role": "user", "content": message}
         ],
-        max_tokens=500
+        response_format={"type": "json_schema", "json_schema": GENERAL_QUERY_SCHEMA},
+        max_tokens=700
     )
-    text = response.choices[0].message.content.strip()
-    lines = text.split("\n")
-    diagnosis = lines[0].replace("Diagnosis: ", "") if "Diagnosis" in lines[0] else "Possible condition unclear"
-    description = next((l for l in lines if "Description" in l), "Description: Further evaluation needed").replace("Description: ", "")
-    severity = next((l for l in lines if "Severity" in l), "Severity: moderate").replace("Severity: ", "")
-    specialty = next((l for l in lines if "Specialty" in l), "Specialty: General Practitioner").replace("Specialty: ", "")
-    confidence = float(next((l for l in lines if "Confidence" in l), "Confidence: 0.5").replace("Confidence: ", ""))
-    health_data = HealthResponse(diagnosis=diagnosis, description=description, severity=severity, recommended_speciality=specialty, confidence=confidence)
-    
+    return parse_general_query_answer(response.choices[0].message.content)
+
+async def finish_general_query(session_id: str, message: str, answer: dict, current_user: User) -> dict:
+    """Format the final assistant message, persist the exchange and build the /general response."""
+    category = answer["category"]
+    content = answer["content"]
+    diagnosis = answer["diagnosis"]
     doctor_suggestions = []
-    if health_data.severity.lower() == "high":
-        try:
-            lat, lon = await get_user_location()
-            doctor_suggestions = await fetch_doctors(
-                specialty=health_data.recommended_speciality,
-                latitude=lat,
-                longitude=lon,
-                all_results=True
-            )
-        except Exception as e:
-            logger.warning(f"Failed to fetch doctors: {str(e)}")
+
+    if diagnosis:
+        # Final assistant message to show
+        content = (
+            f"Diagnosis: {diagnosis['diagnosis']}\n"
+            f"Description: {diagnosis['description']}\n"
+            f"Severity: {diagnosis['severity']}\n"
+            f"Recommended Specialist: {diagnosis['specialty']}\n"
+            f"Confidence: {round(diagnosis['confidence'] * 100)}%"
+        )
+
+        if diagnosis["severity"] == "high":
+            try:
+                lat, lon = await get_user_location()
+                doctor_suggestions = await fetch_doctors(diagnosis["specialty"], lat, lon, all_results=True)
+            except Exception as e:
+                logger.warning(f"Doctor fetch failed: {e}")
+
+    async with get_connection() as conn:
+        await save_exchange(conn, session_id, message, content)
+    await mark_user_write(current_user.id)
+
     return {
-        "diagnosis": health_data,
+        "session_id": session_id,
+        "category": category,
+        "response": content,
+        "suggested_specialty": diagnosis["specialty"] if diagnosis else None,
+        "high_severity": bool(diagnosis) and diagnosis["severity"] == "high",
         "suggested_doctors": doctor_suggestions
     }
 
 async def handle_general_query(request: GeneralQueryRequest, current_user: User, force_new: bool = False):
     message = request.message.strip()
-    conn = await get_db_connection()
 
     try:
-        existing_session = None
-        if not force_new:
-            existing_session = await conn.fetchrow(
-                "SELECT id, created_at FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT 1",
-                str(current_user.id)
+        # Hold a pooled connection only for the DB work, never across the OpenAI call
+        async with get_connection() as conn:
+            session_id = await get_or_create_session(
+                conn, str(current_user.id), f"General Query {datetime.utcnow()}", "Friendly Chat", force_new=force_new
             )
 
-        if existing_session and not is_session_expired(existing_session["created_at"]):
-            session_id = str(existing_session["id"])
-            logger.info(f"Reusing session: {session_id}")
+        answer = await complete_general_query(message)
+        return await finish_general_query(session_id, message, answer, current_user)
+
+    except Exception as e:
+        logger.error(f"Failed to process general query: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to process message")
+
+# -------------------- STREAMING --------------------
+# With ?stream=true, /general and /symptoms answer with Server-Sent Events instead of JSON:
+#   event: start  {"session_id": ...}                    as soon as the session exists
+#   event: delta  {"text": ...}                          answer text as the model writes it
+#   event: done   {same body as the non-streaming call}  once the answer is complete
+#   event: error  {"detail": ...}                        instead of done if anything fails
+# The exchange is saved once, just before done; a stream the client abandons saves nothing.
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_completion(**kwargs):
+    """Yield the text deltas of a streamed chat completion."""
+    stream = await openai_client.chat.completions.create(stream=True, **kwargs)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+class JsonStringFieldStream:
+    """Incrementally decodes one top-level string field out of a JSON object arriving in pieces."""
+
+    def __init__(self, field: str):
+        self._opening = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._start = None
+        self._emitted = 0
+        self._closed = False
+
+    def feed(self, delta: str) -> str:
+        """Add the next piece of raw JSON and return the newly decoded part of the field, if any."""
+        self._buffer += delta
+        if self._closed:
+            return ""
+        if self._start is None:
+            match = self._opening.search(self._buffer)
+            if not match:
+                return ""
+            self._start = match.end()
+
+        raw = self._buffer[self._start:]
+        end = re.search(r'(?<!\\)(?:\\\\)*"', raw)
+        if end:
+            raw = raw[:end.end() - 1]
+            self._closed = True
         else:
-            session_id = str(uuid.uuid4())
-            await conn.execute(
-                "INSERT INTO sessions (id, user_id, session_name, response_format, created_at) VALUES ($1, $2, $3, $4, $5)",
-                session_id, str(current_user.id), f"General Query {datetime.utcnow()}", "Friendly Chat", datetime.utcnow()
+            # Hold back an escape sequence that has not fully arrived yet
+            raw = re.sub(r'(?<!\\)((?:\\\\)*)\\(u[0-9a-fA-F]{0,3})?$', r"\1", raw)
+        try:
+            text = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            return ""
+        if not self._closed and text and "\ud800" <= text[-1] <= "\udbff":
+            # First half of a surrogate pair; wait for the second
+            text = text[:-1]
+        new, self._emitted = text[self._emitted:], len(text)
+        return new
+
+async def stream_general_query(request: GeneralQueryRequest, current_user: User, force_new: bool = False):
+    message = request.message.strip()
+    try:
+        async with get_connection() as conn:
+            session_id = await get_or_create_session(
+                conn, str(current_user.id), f"General Query {datetime.utcnow()}", "Friendly Chat", force_new=force_new
             )
-            logger.info(f"Created new session: {session_id}")
-
-        prompt = (
-            "You are a health assistant. Determine if the message is about a medicine, symptoms, or something else.\n"
-            "Respond in this format:\n"
-            "Category: [medicine/symptom/general]\n"
-            "Content: [Give a helpful answer. If it's a medicine, include common usage and dosage.]"
-        )
+        yield sse_event("start", {"session_id": session_id})
 
-        response = await openai_client.chat.completions.create(
+        # The structured answer arrives as JSON; only its content field is readable text
+        raw, content = [], JsonStringFieldStream("content")
+        async for delta in _stream_completion(
             model="gpt-4o-2024-08-06",
             messages=[
-                {"role": "system", "content": prompt},
+                {"role": "system", "content": GENERAL_QUERY_PROMPT},
                 {"role": "user", "content": message}
             ],
-            max_tokens=500
-        )
-
-        output = response.choices[0].message.content.strip()
-        lines = output.split("\n")
-        category = next((l for l in lines if l.startswith("Category:")), "Category: general").replace("Category:", "").strip()
-        content = next((l for l in lines if l.startswith("Content:")), "Content: Unable to understand").replace("Content:", "").strip()
-        doctor_suggestions = []
-
-        if category.lower() == "symptom":
-            # Ask for structured response like diagnosis, severity, etc.
-            structured = await openai_client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a medical expert. Based on the symptom, respond in the following format:\n"
-                                   "Diagnosis: ...\nDescription: ...\nSeverity: low/moderate/high\nSpecialty: ...\nConfidence: 0.0-1.0"
-                    },
-                    {"role": "user", "content": message}
-                ],
-                max_tokens=500
-            )
+            response_format={"type": "json_schema", "json_schema": GENERAL_QUERY_SCHEMA},
+            max_tokens=700
+        ):
+            raw.append(delta)
+            text = content.feed(delta)
+            if text:
+                yield sse_event("delta", {"text": text})
+
+        answer = parse_general_query_answer("".join(raw))
+        yield sse_event("done", await finish_general_query(session_id, message, answer, current_user))
+    except Exception as e:
+        logger.error(f"Failed to stream general query: {str(e)}")
+        yield sse_event("error", {"detail": "Failed to process message"})
 
-            text = structured.choices[0].message.content.strip()
-            lines = text.split("\n")
-            diagnosis = next((l.replace("Diagnosis: ", "") for l in lines if "Diagnosis:" in l), "Unknown")
-            description = next((l.replace("Description: ", "") for l in lines if "Description:" in l), "No description.")
-            severity = next((l.replace("Severity: ", "") for l in lines if "Severity:" in l), "moderate")
-            specialty = next((l.replace("Specialty: ", "") for l in lines if "Specialty:" in l), "General Practitioner")
-            confidence = float(next((l.replace("Confidence: ", "") for l in lines if "Confidence:" in l), "0.5"))
-
-            # Final assistant message to show
-            content = (
-                f"Diagnosis: {diagnosis}\n"
-                f"Description: {description}\n"
-                f"Severity: {severity}\n"
-                f"Recommended Specialist: {specialty}\n"
-                f"Confidence: {round(confidence * 100)}%"
+async def stream_symptoms(symptoms: List[str], current_user: User):
+    try:
+        async with get_connection() as conn:
+            session_id = await get_or_create_session(
+                conn, str(current_user.id) if current_user.id is not None else None, f"Symptoms {datetime.utcnow()}", "Diagnosis Style"
             )
-
-            if severity.lower() == "high":
-                try:
-                    lat, lon = await get_user_location()
-                    doctor_suggestions = await fetch_doctors(specialty, lat, lon, all_results=True)
-                except Exception as e:
-                    logger.warning(f"Doctor fetch failed: {e}")
-
-        await conn.execute(
-            "INSERT INTO messages (session_id, role, content, created_at) VALUES ($1, $2, $3, $4)",
-            session_id, "user", message, datetime.utcnow()
-        )
-        await conn.execute(
-            "INSERT INTO messages (session_id, role, content, created_at) VALUES ($1, $2, $3, $4)",
-            session_id, "assistant", content, datetime.utcnow()
-        )
-
-        return {
+        yield sse_event("start", {"session_id": session_id})
+
+        normalized = symptom_cache.normalize_symptoms(symptoms)
+        key = symptom_cache.cache_key(normalized, SYMPTOM_PROMPT_VERSION)
+        cached = await symptom_cache.get(key)
+        from_cache = cached is not None
+        if not from_cache:
+            text = []
+            async for delta in _stream_completion(model="gpt-4o-2024-08-06", messages=_symptom_messages(normalized), max_tokens=500):
+                text.append(delta)
+                yield sse_event("delta", {"text": delta})
+            cached = parse_symptom_analysis("".join(text))
+            await symptom_cache.put(key, cached)
+        health_data = HealthResponse(**cached)
+        user_content, assistant_content = _symptom_exchange(symptoms, health_data)
+        if from_cache:
+            # Nothing was streamed; send the whole answer as one delta
+            yield sse_event("delta", {"text": assistant_content})
+        suggested_doctors = await _symptom_doctor_suggestions(health_data)
+
+        async with get_connection() as conn:
+            await save_exchange(conn, session_id, user_content, assistant_content)
+        await mark_user_write(current_user.id)
+        yield sse_event("done", {
             "session_id": session_id,
-            "category": category,
-            "response": content,
-            "suggested_specialty": specialty if category.lower() == "symptom" else None,
-            "high_severity": severity.lower() == "high" if category.lower() == "symptom" else False,
-            "suggested_doctors": doctor_suggestions
-        }
-
+            "response": health_data.dict(),
+            "suggested_doctors": suggested_doctors
+        })
     except Exception as e:
-        logger.error(f"Failed to process general query: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to process message")
-    finally:
-        await conn.close()
+        logger.error(f"Failed to stream symptoms: {str(e)}")
+        yield sse_event("error", {"detail": "Failed to process symptoms"})
 
 async def check_drug_interactions(request: DrugInteractionRequest, user: User) -> dict:
     if len(request.drugs) < 2:
@@ -269,38 +494,26 @@ async def check_drug_interactions(request: DrugInteractionRequest, user: User) -
 
 # -------------------- ENDPOINTS --------------------
 @router.post("/symptoms")
-async def health_assistant_symptoms(request: SymptomRequest, current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
+async def health_assistant_symptoms(
+    request: SymptomRequest,
+    stream: bool = Query(False),
+    current_user: User = Depends(get_current_user)
+):
+    # Before streaming starts, so bad input is a 422 rather than an error event on a 200
+    _validate_symptoms(request.symptoms)
+    if stream:
+        return sse_response(stream_symptoms(request.symptoms, current_user))
     try:
-        existing_session = await conn.fetchrow(
-            "SELECT id, created_at FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT 1",
-            str(current_user.id)
-        )
-
-        if existing_session and not is_session_expired(existing_session["created_at"]):
-            session_id = str(existing_session["id"])
-            logger.info(f"Reusing session: {session_id}")
-        else:
-            session_id = str(uuid.uuid4())
-            await conn.execute(
-                "INSERT INTO sessions (id, user_id, session_name, response_format, created_at) "
-                "VALUES ($1, $2, $3, $4, $5)",
-                session_id, str(current_user.id) if current_user.id is not None else None, f"Symptoms {datetime.utcnow()}", "Diagnosis Style", datetime.utcnow()
+        async with get_connection() as conn:
+            session_id = await get_or_create_session(
+                conn, str(current_user.id) if current_user.id is not None else None, f"Symptoms {datetime.utcnow()}", "Diagnosis Style"
             )
-            logger.info(f"Created new session: {session_id}")
 
         response_data = await analyze_symptoms(request.symptoms, current_user)
-    
-        await conn.execute(
-            "INSERT INTO messages (session_id, role, content, created_at) "
-            "VALUES ($1, $2, $3, $4)",
-            session_id, "user", f"Symptoms: {', '.join(request.symptoms)}", datetime.utcnow()
-        )
-        await conn.execute(
-            "INSERT INTO messages (session_id, role, content, created_at) "
-            "VALUES ($1, $2, $3, $4)",
-            session_id, "assistant", f"Diagnosis: {response_data['diagnosis'].diagnosis}\nDescription: {response_data['diagnosis'].description}\nSeverity: {response_data['diagnosis'].severity}\nRecommended Specialty: {response_data['diagnosis'].recommended_speciality}\nConfidence: {response_data['diagnosis'].confidence}", datetime.utcnow()
-        )
+
+        async with get_connection() as conn:
+            await save_exchange(conn, session_id, *_symptom_exchange(request.symptoms, response_data["diagnosis"]))
+        await mark_user_write(current_user.id)
         return {
             "session_id": session_id,
             "response": response_data["diagnosis"].dict(),
@@ -309,108 +522,92 @@ async def health_assistant_symptoms(request: SymptomRequest, current_user: User
     except Exception as e:
         logger.error(f"Failed to process symptoms: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process symptoms")
-    finally:
-        await conn.close()
 
 @router.get("/sessions/latest")
 async def get_latest_session(current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
     try:
-        result = await conn.fetchrow(
-            "SELECT id FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT 1",
-            str(current_user.id)
-        )
-        if not result:
-            raise HTTPException(status_code=404, detail="No session found.")
-        return {"session_id": result["id"]}
+        async with get_connection() as conn:
+            result = await queries.fetchrow(conn, "latest_session", str(current_user.id))
+            if not result:
+                raise HTTPException(status_code=404, detail="No session found.")
+            return {"session_id": result["id"]}
     except Exception as e:
         logger.error(f"Failed to fetch latest session: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch latest session")
-    finally:
-        await conn.close()
 
 @router.get("/messages")
 async def get_session_messages(session_id: str, current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
     try:
-        messages = await conn.fetch(
-            "SELECT role, content FROM messages WHERE session_id = $1 ORDER BY created_at ASC",
-            session_id
-        )
-        return [{"role": m["role"], "content": m["content"]} for m in messages]
+        async with get_read_connection(current_user.id) as conn:
+            messages = await queries.fetch(conn, "session_messages", session_id)
+            return [{"role": m["role"], "content": m["content"]} for m in messages]
     except Exception as e:
         logger.error(f"Failed to fetch messages: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch messages")
-    finally:
-        await conn.close()
 
 @router.post("/general")
 async def general_query_endpoint(
     request: GeneralQueryRequest,
     force_new: bool = Query(False),
+    stream: bool = Query(False),
     current_user: User = Depends(get_current_user)
 ):
+    if stream:
+        return sse_response(stream_general_query(request, current_user, force_new=force_new))
     return await handle_general_query(request, current_user, force_new=force_new)
 
 @router.get("/sessions")
 async def get_all_sessions(offset: int = 0, limit: int = 10, current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
     try:
-        rows = await conn.fetch(
-            "SELECT id, session_name, created_at FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2 OFFSET $3",
-            str(current_user.id), limit, offset
-        )
-        return [{"id": r["id"], "name": r["session_name"], "created_at": r["created_at"]} for r in rows]
+        async with get_read_connection(current_user.id) as conn:
+            rows = await queries.fetch(conn, "user_sessions", str(current_user.id), limit, offset)
+            return [{"id": r["id"], "name": r["session_name"], "created_at": r["created_at"]} for r in rows]
     except Exception as e:
         logger.error(f"Failed to fetch sessions: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch sessions")
-    finally:
-        await conn.close()
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
     try:
-        session = await conn.fetchrow("SELECT id FROM sessions WHERE id = $1 AND user_id = $2", session_id, str(current_user.id))
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found or unauthorized")
+        async with get_connection() as conn:
+            session = await conn.fetchrow("SELECT id FROM sessions WHERE id = $1 AND user_id = $2", session_id, str(current_user.id))
+            if not session:
+                raise HTTPException(status_code=404, detail="Session not found or unauthorized")
         
-        await conn.execute("DELETE FROM messages WHERE session_id = $1", session_id)
-        await conn.execute("DELETE FROM sessions WHERE id = $1", session_id)
-        return {"message": "Session deleted"}
+            await conn.execute("DELETE FROM messages WHERE session_id = $1", session_id)
+            await conn.execute("DELETE FROM sessions WHERE id = $1", session_id)
+            await mark_user_write(current_user.id)
+            return {"message": "Session deleted"}
     except Exception as e:
         logger.error(f"Failed to delete session: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to delete session")
-    finally:
-        await conn.close()
 
 @router.put("/sessions/{session_id}/rename")
 async def rename_session(session_id: str, request: dict, current_user: User = Depends(get_current_user)):
-    conn = await get_db_connection()
     try:
-        session = await conn.fetchrow(
-            "SELECT id FROM sessions WHERE id = $1 AND user_id = $2",
-            session_id,
-            str(current_user.id)
-        )
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found or unauthorized")
+        async with get_connection() as conn:
+            session = await conn.fetchrow(
+                "SELECT id FROM sessions WHERE id = $1 AND user_id = $2",
+                session_id,
+                str(current_user.id)
+            )
+            if not session:
+                raise HTTPException(status_code=404, detail="Session not found or unauthorized")
 
-        name = request.get("name")
-        if not name or not name.strip():
-            raise HTTPException(status_code=400, detail="Name cannot be empty")
+            name = request.get("name")
+            if not name or not name.strip():
+                raise HTTPException(status_code=400, detail="Name cannot be empty")
 
-        await conn.execute(
-            "UPDATE sessions SET session_name = $1 WHERE id = $2",
-            name.strip(),
-            session_id
-        )
-        return {"message": "Session renamed"}
+            await conn.execute(
+                "UPDATE sessions SET session_name = $1 WHERE id = $2",
+                name.strip(),
+                session_id
+            )
+            await mark_user_write(current_user.id)
+            return {"message": "Session renamed"}
     except Exception as e:
         logger.error(f"Failed to rename session: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to rename session: {str(e)}")
-    finally:
-        await conn.close()
 
 @router.get("/tip")
 async def get_health_tip_openai():
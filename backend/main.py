@@ -1,24 +1,30 @@
-from fastapi import FastAPI, Depends, APIRouter
+from fastapi import FastAPI, Depends, APIRouter, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import logging
 import httpx
 import os
+from typing import Optional
 from dotenv import load_dotenv
 
-from backend.database import init_db
+from backend.database import init_db, init_pool, close_pool, get_pool_stats
+from backend.db_metrics import get_query_metrics
+from backend.symptom_cache import get_cache_stats
 from backend.chat import chat, get_sessions, ChatRequest
 from backend.doctor_search import router as doctor_router
 from backend.image_analysis import router as image_router
 from backend.health_assistant import router as health_router
 from backend.auth.auth import get_current_user
+from backend.auth.user_cache import start_invalidation_listener, stop_invalidation_listener
+from backend.services.notifications import start_notification_dispatcher, stop_notification_dispatcher
+from backend.utils.email import close_email_client
 from backend.auth.routes import router as auth_router
 from backend.auth.schemas import User
 from backend.emergency_info import router as emergency_router
 from backend.models.reminders import ReminderCreate
 from backend.services.reminders import (
-    create_reminder, get_reminders, delete_reminder, get_reminder_history
+    create_reminder, get_reminders, delete_reminder, get_reminder_history, import_reminders
 )
 
 # Load environment variables
@@ -62,13 +68,35 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    await init_pool()
     logger.info("✅ Database initialized")
+    await start_invalidation_listener()
+    await start_notification_dispatcher()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_notification_dispatcher()
+    await close_email_client()
+    await stop_invalidation_listener()
+    await close_pool()
 
 # Health Check
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    return get_pool_stats()
+
+@app.get("/health/db-queries")
+async def db_query_metrics():
+    return get_query_metrics()
+
+@app.get("/health/symptom-cache")
+async def symptom_cache_stats():
+    return get_cache_stats()
+
 # Internal API Router
 router = APIRouter()
 
@@ -86,6 +114,14 @@ async def sessions_endpoint(current_user: User = Depends(get_current_user)):
 async def create_reminder_endpoint(reminder: ReminderCreate, current_user: User = Depends(get_current_user)):
     return await create_reminder(reminder, current_user)
 
+# Body: a JSON array of reminders, JSON lines (Content-Type: application/x-ndjson), or CSV with a
+# medicine,reminder_time,frequency header (Content-Type: text/csv). Read as a stream, never buffered whole.
+@router.post("/reminders/bulk")
+async def import_reminders_endpoint(request: Request, current_user: User = Depends(get_current_user)):
+    return await import_reminders(
+        request.stream(), request.headers.get("content-type", ""), request.headers.get("content-length"), current_user
+    )
+
 @router.get("/reminders")
 async def get_reminders_endpoint(current_user: User = Depends(get_current_user)):
     return await get_reminders(current_user)
@@ -95,8 +131,12 @@ async def delete_reminder_endpoint(reminder_id: int, current_user: User = Depend
     return await delete_reminder(reminder_id, current_user)
 
 @router.get("/reminder-history")
-async def reminder_history_endpoint(current_user: User = Depends(get_current_user)):
-    return await get_reminder_history(current_user)
+async def reminder_history_endpoint(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    return await get_reminder_history(current_user, limit, cursor)
 
 # 🌍 Country via IP necropsy
 async def get_user_country():
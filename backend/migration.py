@@ -1,14 +1,102 @@
+# backend/migration.py
 import asyncio
 import asyncpg
 import os
-from dotenv import load_dotenv
+import re
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-async def run_migration():
-    conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
-    await conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN DEFAULT FALSE;")
-    print("✅ Migration completed: 'is_verified' column added.")
-    await conn.close()
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
 
-asyncio.run(run_migration())
+# Files starting with this marker run statement by statement outside a transaction
+# (required for CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+# Arbitrary key for pg_advisory_lock so only one worker applies migrations at a time
+MIGRATION_LOCK_ID = 5_831_202
+MIGRATION_LOCK_POLL_INTERVAL = 0.5
+
+def load_migrations() -> list[tuple[int, str, str]]:
+    """Return (version, name, sql) for every migration file, ordered by version."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    migrations.sort(key=lambda m: m[0])
+
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return migrations
+
+def split_statements(sql: str) -> list[str]:
+    """Split a migration on statement-terminating semicolons, dropping comment-only chunks."""
+    statements = []
+    for chunk in re.split(r";\s*$", sql, flags=re.MULTILINE):
+        code = "\n".join(l for l in chunk.splitlines() if not l.strip().startswith("--")).strip()
+        if code:
+            statements.append(code)
+    return statements
+
+async def get_schema_version(conn) -> int:
+    try:
+        return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+async def apply_migrations(conn, target: int = None) -> int:
+    """
+    Bring the schema up to the latest migration (or `target`) and return the resulting version.
+    When the schema is already current this costs a single SELECT.
+    """
+    migrations = load_migrations()
+    if target is not None:
+        migrations = [m for m in migrations if m[0] <= target]
+    latest = migrations[-1][0] if migrations else 0
+
+    current = await get_schema_version(conn)
+    if current >= latest:
+        return current
+
+    # Poll rather than block: a session waiting inside pg_advisory_lock holds a snapshot
+    # that CREATE INDEX CONCURRENTLY in the migrating session would wait on forever
+    while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MIGRATION_LOCK_ID):
+        await asyncio.sleep(MIGRATION_LOCK_POLL_INTERVAL)
+    try:
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Another worker may have finished while we waited for the lock
+        current = await get_schema_version(conn)
+        for version, name, sql in migrations:
+            if version <= current:
+                continue
+            if sql.lstrip().startswith(NO_TRANSACTION_MARKER):
+                for statement in split_statements(sql):
+                    await conn.execute(statement)
+                await conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                    version, name
+                )
+            else:
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                        version, name
+                    )
+            logger.info(f"✅ Applied migration {version:03d}_{name}")
+            current = version
+        return current
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
@@ -0,0 +1,6 @@
+-- Previously applied by hand via migration.py / run_migration.py
+ALTER TABLE users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN DEFAULT FALSE;
+
+-- Read by the reminder task and written by the profile settings endpoints
+ALTER TABLE users ADD COLUMN IF NOT EXISTS phone TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS preferred_notification TEXT DEFAULT 'email';
@@ -0,0 +1,34 @@
+-- migrate: no-transaction
+-- Built CONCURRENTLY so large tables stay writable while the indexes are created.
+
+-- Latest-session lookup and /health/sessions paging:
+-- WHERE user_id = $1 ORDER BY created_at DESC LIMIT n
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_sessions_user_created
+    ON sessions (user_id, created_at DESC);
+
+-- Conversation replay: WHERE session_id = $1 ORDER BY created_at
+-- (also serves the ON DELETE CASCADE from sessions)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_session_created
+    ON messages (session_id, created_at);
+
+-- GET /reminders: WHERE user_id = $1 ORDER BY created_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminders_user_created
+    ON reminders (user_id, created_at DESC);
+
+-- GET /reminder-history: WHERE user_id = $1 ORDER BY sent_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminder_history_user_sent
+    ON reminder_history (user_id, sent_at DESC);
+
+-- ON DELETE CASCADE from reminders would otherwise scan the whole history table
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reminder_history_reminder
+    ON reminder_history (reminder_id);
+
+-- Anonymous search quota: SELECT COUNT(*) ... WHERE user_id = $1
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctor_searches_user
+    ON doctor_searches (user_id);
+
+-- Refresh lookup: WHERE token = $1 AND revoked = FALSE AND expires_at > NOW()
+-- Only live tokens are indexed, and expires_at/user_id ride along to avoid a heap visit for the filter
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_refresh_tokens_live
+    ON refresh_tokens (token) INCLUDE (expires_at, user_id)
+    WHERE revoked = FALSE;
@@ -0,0 +1,11 @@
+-- Refresh tokens are looked up by their SHA-256 digest; the raw JWT is never stored.
+-- A 32-byte key also keeps the unique index far smaller than one over the full token text.
+ALTER TABLE refresh_tokens ADD COLUMN IF NOT EXISTS token_hash BYTEA;
+
+UPDATE refresh_tokens SET token_hash = sha256(convert_to(token, 'UTF8')) WHERE token_hash IS NULL;
+
+ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_tokens_hash ON refresh_tokens (token_hash);
+
+-- Drops refresh_tokens_token_key and idx_refresh_tokens_live along with the column
+ALTER TABLE refresh_tokens DROP COLUMN IF EXISTS token;
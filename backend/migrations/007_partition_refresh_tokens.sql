@@ -0,0 +1,50 @@
+-- Range-partition refresh_tokens by expires_at, one partition per month, so expired tokens
+-- go away by dropping a whole partition (see backend/tasks/maintenance.py) instead of
+-- deleting rows one by one. Only live tokens are carried over.
+ALTER TABLE refresh_tokens RENAME TO refresh_tokens_unpartitioned;
+ALTER INDEX idx_refresh_tokens_hash RENAME TO idx_refresh_tokens_hash_unpartitioned;
+
+CREATE TABLE refresh_tokens (
+    id SERIAL,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    token_hash BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    revoked BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (id, expires_at)
+) PARTITION BY RANGE (expires_at);
+
+-- Unique indexes on a partitioned table must contain the partition key; the jti claim
+-- already makes every token (and so every hash) distinct
+CREATE UNIQUE INDEX idx_refresh_tokens_hash ON refresh_tokens (token_hash, expires_at);
+
+-- Lets the reaper find revoked-but-unexpired rows without scanning the live partitions
+CREATE INDEX idx_refresh_tokens_revoked ON refresh_tokens (expires_at) WHERE revoked = TRUE;
+
+-- Catches anything beyond the partitions created ahead of time
+CREATE TABLE refresh_tokens_default PARTITION OF refresh_tokens DEFAULT;
+
+CREATE OR REPLACE FUNCTION ensure_refresh_token_partitions(months_ahead INT) RETURNS VOID AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', NOW()) + make_interval(months => i))::date;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF refresh_tokens FOR VALUES FROM (%L) TO (%L)',
+            'refresh_tokens_p' || to_char(month_start, 'YYYYMM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_refresh_token_partitions(3);
+
+INSERT INTO refresh_tokens (user_id, token_hash, created_at, expires_at, revoked)
+SELECT user_id, token_hash, created_at, expires_at, revoked
+FROM refresh_tokens_unpartitioned
+WHERE revoked = FALSE AND expires_at > NOW();
+
+DROP TABLE refresh_tokens_unpartitioned;
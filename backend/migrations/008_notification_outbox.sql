@@ -0,0 +1,19 @@
+-- Outgoing notifications queued by request handlers and delivered by
+-- backend/services/notifications.py. Rows are deleted once sent; rows that
+-- exhaust their retries stay behind with status 'failed' and the last error.
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    channel TEXT NOT NULL DEFAULT 'email',
+    recipient TEXT NOT NULL,
+    subject TEXT,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Dispatcher poll: WHERE status = 'pending' AND next_attempt_at <= NOW() ORDER BY next_attempt_at
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+    ON notification_outbox (next_attempt_at) WHERE status = 'pending';
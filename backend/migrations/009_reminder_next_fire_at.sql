@@ -0,0 +1,67 @@
+-- Reminders fire from a precomputed UTC next_fire_at instead of matching reminder_time::text
+-- against one hard-coded clock. reminder_time is wall-clock time in the owner's time zone.
+
+-- reminders.user_id is a UUID referencing users(id) ON DELETE CASCADE, so a deleted user's
+-- reminders go with them. Databases whose reminders/reminder_history came from the old
+-- hand-run TEXT migrations are converted here, before anything below compares user ids.
+-- Reminders that don't belong to an existing user could never be delivered and are deleted.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'reminders' AND column_name = 'user_id') <> 'uuid' THEN
+        DELETE FROM reminders r WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id::text = lower(r.user_id));
+        ALTER TABLE reminders ALTER COLUMN user_id TYPE UUID USING user_id::uuid;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'reminders'::regclass AND conname = 'reminders_user_id_fkey') THEN
+        DELETE FROM reminders r WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = r.user_id);
+        ALTER TABLE reminders ADD CONSTRAINT reminders_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+    END IF;
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'reminder_history' AND column_name = 'user_id') <> 'uuid' THEN
+        DELETE FROM reminder_history
+        WHERE user_id !~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$';
+        ALTER TABLE reminder_history ALTER COLUMN user_id TYPE UUID USING user_id::uuid;
+    END IF;
+END;
+$$;
+DELETE FROM reminders WHERE user_id IS NULL;
+ALTER TABLE reminders ALTER COLUMN user_id SET NOT NULL;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone TEXT NOT NULL DEFAULT 'Europe/Berlin';
+
+-- Next occurrence strictly after `after`. Weekly reminders keep the weekday of `anchor`
+-- (the creation date); monthly ones keep its day of month, clamped to short months.
+CREATE OR REPLACE FUNCTION reminder_next_fire_at(
+    fire_time TIME, frequency TEXT, anchor DATE, tz TEXT, after TIMESTAMPTZ
+) RETURNS TIMESTAMPTZ AS $$
+DECLARE
+    candidate DATE := (after AT TIME ZONE tz)::date;
+    month_end INT;
+BEGIN
+    LOOP
+        month_end := EXTRACT(DAY FROM date_trunc('month', candidate) + INTERVAL '1 month - 1 day');
+        IF (frequency = 'weekly' AND EXTRACT(DOW FROM candidate) <> EXTRACT(DOW FROM anchor))
+           OR (frequency = 'monthly' AND EXTRACT(DAY FROM candidate) <> LEAST(EXTRACT(DAY FROM anchor), month_end)) THEN
+            candidate := candidate + 1;
+        ELSIF ((candidate + fire_time) AT TIME ZONE tz) > after THEN
+            RETURN (candidate + fire_time) AT TIME ZONE tz;
+        ELSE
+            candidate := candidate + 1;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS next_fire_at TIMESTAMPTZ;
+
+UPDATE reminders r
+SET next_fire_at = reminder_next_fire_at(
+    r.reminder_time, r.frequency, r.created_at::date,
+    COALESCE((SELECT u.timezone FROM users u WHERE u.id = r.user_id), 'Europe/Berlin'),
+    NOW()
+);
+
+-- Due scan: WHERE status = 'active' AND next_fire_at <= NOW() ORDER BY next_fire_at
+CREATE INDEX IF NOT EXISTS idx_reminders_next_fire
+    ON reminders (next_fire_at) WHERE status = 'active';
@@ -0,0 +1,22 @@
+-- Publishes reminder inserts, deletes and reschedules on the reminders_changed channel so the
+-- optional in-process scheduler (backend/tasks/scheduler.py) can keep its timer heap current
+-- without rescanning the table. next_fire_at is sent as epoch seconds, or null once the
+-- reminder no longer needs to fire (deleted or inactive).
+CREATE OR REPLACE FUNCTION notify_reminder_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('reminders_changed', json_build_object('id', OLD.id, 'next_fire_at', NULL)::text);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('reminders_changed', json_build_object(
+        'id', NEW.id,
+        'next_fire_at', CASE WHEN NEW.status = 'active' THEN EXTRACT(EPOCH FROM NEW.next_fire_at) END
+    )::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reminders_notify_change ON reminders;
+CREATE TRIGGER reminders_notify_change
+    AFTER INSERT OR DELETE OR UPDATE OF next_fire_at, status ON reminders
+    FOR EACH ROW EXECUTE FUNCTION notify_reminder_change();
@@ -0,0 +1,67 @@
+-- Range-partition reminder_history by sent_at, one partition per month, so history older than
+-- the retention window is archived and dropped a month at a time (backend/tasks/maintenance.py).
+-- Existing rows are carried over with their ids.
+
+-- Creates <parent>_pYYYYMM partitions for every month from first_month through last_month
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, first_month DATE, last_month DATE) RETURNS VOID AS $$
+DECLARE
+    month_start DATE := date_trunc('month', first_month)::date;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            parent || '_p' || to_char(month_start, 'YYYYMM'),
+            parent,
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_refresh_token_partitions(months_ahead INT) RETURNS VOID AS $$
+    SELECT ensure_monthly_partitions(
+        'refresh_tokens', NOW()::date, (NOW() + make_interval(months => months_ahead))::date
+    );
+$$ LANGUAGE sql;
+
+ALTER TABLE reminder_history RENAME TO reminder_history_unpartitioned;
+ALTER INDEX IF EXISTS idx_reminder_history_user_sent RENAME TO idx_reminder_history_user_sent_unpartitioned;
+ALTER INDEX IF EXISTS idx_reminder_history_reminder RENAME TO idx_reminder_history_reminder_unpartitioned;
+
+CREATE TABLE reminder_history (
+    id SERIAL,
+    user_id UUID NOT NULL,
+    reminder_id INT NOT NULL REFERENCES reminders(id) ON DELETE CASCADE,
+    sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    delivery_status TEXT DEFAULT 'pending',
+    PRIMARY KEY (id, sent_at)
+) PARTITION BY RANGE (sent_at);
+
+-- GET /reminder-history pages: WHERE user_id = $1 AND (sent_at, id) < ($2, $3)
+-- ORDER BY sent_at DESC, id DESC LIMIT n
+CREATE INDEX idx_reminder_history_user_sent ON reminder_history (user_id, sent_at DESC, id DESC);
+
+-- ON DELETE CASCADE from reminders
+CREATE INDEX idx_reminder_history_reminder ON reminder_history (reminder_id);
+
+CREATE TABLE reminder_history_default PARTITION OF reminder_history DEFAULT;
+
+SELECT ensure_monthly_partitions(
+    'reminder_history',
+    COALESCE((SELECT MIN(sent_at) FROM reminder_history_unpartitioned), NOW())::date,
+    (NOW() + INTERVAL '3 months')::date
+);
+
+INSERT INTO reminder_history (id, user_id, reminder_id, sent_at, delivery_status)
+SELECT id, user_id, reminder_id, COALESCE(sent_at, NOW()), delivery_status
+FROM reminder_history_unpartitioned;
+
+SELECT setval(
+    pg_get_serial_sequence('reminder_history', 'id'),
+    COALESCE((SELECT MAX(id) FROM reminder_history), 0) + 1,
+    false
+);
+
+DROP TABLE reminder_history_unpartitioned;
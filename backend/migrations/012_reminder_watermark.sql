@@ -0,0 +1,12 @@
+-- check_reminders records the DB time of its last run that left nothing overdue. A stale
+-- watermark means the worker or beat was down, and the next runs drain the missed reminders
+-- under a rate limit instead of sending them all at once (backend/tasks/tasks.py).
+CREATE TABLE IF NOT EXISTS reminder_watermarks (
+    name TEXT PRIMARY KEY,
+    caught_up_at TIMESTAMPTZ NOT NULL
+);
+
+-- Claim-time dedupe: WHERE reminder_id = $1 AND sent_at >= <slot>. Also serves the
+-- ON DELETE CASCADE from reminders, so it replaces the reminder_id-only index.
+CREATE INDEX IF NOT EXISTS idx_reminder_history_reminder_sent ON reminder_history (reminder_id, sent_at);
+DROP INDEX IF EXISTS idx_reminder_history_reminder;
@@ -0,0 +1,26 @@
+-- Databases that applied an earlier 009 had reminders.user_id and reminder_history.user_id
+-- converted to TEXT and the reminders foreign key dropped, so deleting a user left their
+-- reminders behind. Restore the UUID columns and the ON DELETE CASCADE key (same steps as 009;
+-- a no-op where they are in place).
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'reminders' AND column_name = 'user_id') <> 'uuid' THEN
+        DELETE FROM reminders r WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id::text = lower(r.user_id));
+        ALTER TABLE reminders ALTER COLUMN user_id TYPE UUID USING user_id::uuid;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'reminders'::regclass AND conname = 'reminders_user_id_fkey') THEN
+        DELETE FROM reminders r WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = r.user_id);
+        ALTER TABLE reminders ADD CONSTRAINT reminders_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE;
+    END IF;
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'reminder_history' AND column_name = 'user_id') <> 'uuid' THEN
+        DELETE FROM reminder_history
+        WHERE user_id !~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$';
+        ALTER TABLE reminder_history ALTER COLUMN user_id TYPE UUID USING user_id::uuid;
+    END IF;
+END;
+$$;
+DELETE FROM reminders WHERE user_id IS NULL;
+ALTER TABLE reminders ALTER COLUMN user_id SET NOT NULL;
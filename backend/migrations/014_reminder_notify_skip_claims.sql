@@ -0,0 +1,17 @@
+-- The reminders_changed trigger from 010 fired on every claim, since each claim moves
+-- next_fire_at to the next occurrence, so every delivery paid for a pg_notify even where
+-- nothing LISTENs. Claims only ever move next_fire_at later, and the scheduler doesn't need
+-- to hear about that: a stale earlier heap entry just dispatches a claim that matches nothing,
+-- and the periodic reload picks up the new time. Updates now notify only when the status
+-- changes or next_fire_at moves earlier (e.g. a user switching to an earlier time zone).
+DROP TRIGGER IF EXISTS reminders_notify_change ON reminders;
+
+CREATE TRIGGER reminders_notify_change
+    AFTER INSERT OR DELETE ON reminders
+    FOR EACH ROW EXECUTE FUNCTION notify_reminder_change();
+
+CREATE TRIGGER reminders_notify_reschedule
+    AFTER UPDATE OF next_fire_at, status ON reminders
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status OR NEW.next_fire_at < OLD.next_fire_at)
+    EXECUTE FUNCTION notify_reminder_change();
@@ -0,0 +1,179 @@
+# backend/queries.py
+# Named SQL for the highest-QPS call sites.
+#
+# Statements run through asyncpg's per-connection statement cache (statement_cache_size,
+# see database._create_pool), so Postgres parses and plans each query once per pooled
+# connection instead of once per request. The name is the label the call is recorded
+# under in db_metrics.
+import time
+
+from backend.db_metrics import InstrumentedConnection, record
+
+# Shard of a reminder's owner, in [0, shard count). Masking the sign bit instead of abs() keeps
+# hashtext's INT_MIN result in range (abs(-2147483648) overflows int4)
+REMINDER_SHARD = "(hashtext(user_id::text) & 2147483647) % $2"
+
+# Reminder claim statement, parameterized on which rows are due
+_CLAIM_REMINDERS = """
+    WITH due AS (
+        SELECT r.id, r.next_fire_at AS scheduled_for,
+               u.id IS NOT NULL AS user_found, u.email, u.phone, u.preferred_notification,
+               COALESCE(u.timezone, 'Europe/Berlin') AS timezone,
+               -- This slot is already in the history, e.g. sent by a run whose reschedule was lost.
+               -- sent_at is written in the session time zone, so compare in it too.
+               EXISTS (
+                   SELECT 1 FROM reminder_history h
+                   WHERE h.reminder_id = r.id AND h.sent_at >= r.next_fire_at::timestamp
+                     AND h.delivery_status LIKE '%sent'
+               ) AS already_sent
+        FROM reminders r
+        LEFT JOIN users u ON u.id = r.user_id
+        WHERE r.status = 'active' AND {due}
+        FOR UPDATE OF r SKIP LOCKED
+    )
+    UPDATE reminders r
+    SET next_fire_at = reminder_next_fire_at(
+        r.reminder_time, r.frequency, r.created_at::date, due.timezone, GREATEST(NOW(), due.scheduled_for)
+    )
+    FROM due
+    WHERE r.id = due.id
+    RETURNING r.id, r.user_id, r.medicine, r.reminder_time, due.scheduled_for,
+              due.user_found, due.email, due.phone, due.preferred_notification, due.already_sent
+"""
+
+QUERIES = {
+    # Sessions + messages
+    "latest_session": "SELECT id, created_at FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT 1",
+    "insert_session": "INSERT INTO sessions (id, user_id, session_name, response_format, created_at) VALUES ($1, $2, $3, $4, $5)",
+    "insert_message": "INSERT INTO messages (session_id, role, content, created_at) VALUES ($1, $2, $3, $4)",
+    "session_messages": "SELECT role, content FROM messages WHERE session_id = $1 ORDER BY created_at ASC",
+    "user_sessions": "SELECT id, session_name, created_at FROM sessions WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2 OFFSET $3",
+
+    # Users + tokens
+    "user_by_id": "SELECT id, email, role FROM users WHERE id = $1",
+    "user_credentials_by_email": "SELECT id, email, password, role, is_verified FROM users WHERE email = $1",
+    "insert_refresh_token": "INSERT INTO refresh_tokens (user_id, token_hash, expires_at) VALUES ($1, $2, $3)",
+    "revoke_refresh_token": "UPDATE refresh_tokens SET revoked = TRUE WHERE token_hash = $1 AND revoked = FALSE RETURNING user_id",
+    # Revoke the presented token, issue its replacement and return the user in one round trip.
+    # Concurrent refreshes with the same token serialize on the row lock; the loser re-checks
+    # revoked = FALSE, matches nothing and gets no row back.
+    "rotate_refresh_token": """
+        WITH revoked AS (
+            UPDATE refresh_tokens SET revoked = TRUE
+            WHERE token_hash = $1 AND user_id = $2 AND revoked = FALSE AND expires_at > NOW()
+            RETURNING user_id
+        ), account AS (
+            SELECT u.id, u.email, u.role FROM users u JOIN revoked r ON r.user_id = u.id
+        ), issued AS (
+            INSERT INTO refresh_tokens (user_id, token_hash, expires_at)
+            SELECT id, $3, $4 FROM account
+        )
+        SELECT id, email, role FROM account
+    """,
+
+    # Notification outbox (backend/services/notifications.py)
+    "enqueue_notification": "INSERT INTO notification_outbox (channel, recipient, subject, body) VALUES ($1, $2, $3, $4)",
+
+    # Reminders
+    "insert_reminder": """
+        INSERT INTO reminders (user_id, medicine, reminder_time, frequency, next_fire_at)
+        SELECT $1::uuid, $2, $3, $4, reminder_next_fire_at(
+            $3, $4, CURRENT_DATE,
+            COALESCE((SELECT timezone FROM users WHERE id = $1::uuid), 'Europe/Berlin'), NOW()
+        )
+        RETURNING id
+    """,
+    "user_reminders": "SELECT id, medicine, reminder_time, frequency, status, next_fire_at, created_at FROM reminders WHERE user_id = $1 ORDER BY created_at DESC",
+    "delete_reminder": "DELETE FROM reminders WHERE id = $1 AND user_id = $2",
+    # Keyset pages over idx_reminder_history_user_sent; the cursor is the last row's (sent_at, id)
+    "user_reminder_history": """
+        SELECT id, reminder_id, sent_at, delivery_status FROM reminder_history
+        WHERE user_id = $1 ORDER BY sent_at DESC, id DESC LIMIT $2
+    """,
+    "user_reminder_history_after": """
+        SELECT id, reminder_id, sent_at, delivery_status FROM reminder_history
+        WHERE user_id = $1 AND (sent_at, id) < ($2, $3) ORDER BY sent_at DESC, id DESC LIMIT $4
+    """,
+    "insert_reminder_history": "INSERT INTO reminder_history (reminder_id, user_id, delivery_status) VALUES ($1, $2, $3)",
+
+    # Reminder task (backend/tasks/tasks.py)
+    # Shards keep each user's reminders in one chunk; no rows are locked until a chunk claims them
+    "due_reminder_shards": """
+        SELECT id, {shard} AS shard FROM reminders
+        WHERE status = 'active' AND next_fire_at <= NOW()
+        ORDER BY next_fire_at
+        LIMIT $1
+    """.format(shard=REMINDER_SHARD),
+    # Catch-up mode splits the due scan at $3 seconds ago: recent slots go out at once,
+    # older (missed) ones oldest first under the catch-up limit
+    "recent_reminder_shards": """
+        SELECT id, {shard} AS shard FROM reminders
+        WHERE status = 'active' AND next_fire_at > NOW() - make_interval(secs => $3) AND next_fire_at <= NOW()
+        ORDER BY next_fire_at
+        LIMIT $1
+    """.format(shard=REMINDER_SHARD),
+    "missed_reminder_shards": """
+        SELECT id, {shard} AS shard FROM reminders
+        WHERE status = 'active' AND next_fire_at <= NOW() - make_interval(secs => $3)
+        ORDER BY next_fire_at
+        LIMIT $1
+    """.format(shard=REMINDER_SHARD),
+    "reminder_run_state": """
+        SELECT EXTRACT(EPOCH FROM NOW())::float8 AS now,
+               (SELECT EXTRACT(EPOCH FROM NOW() - caught_up_at)::float8 FROM reminder_watermarks WHERE name = $1) AS lag_seconds
+    """,
+    "advance_reminder_watermark": """
+        INSERT INTO reminder_watermarks (name, caught_up_at) VALUES ($1, to_timestamp($2))
+        ON CONFLICT (name) DO UPDATE SET caught_up_at = GREATEST(reminder_watermarks.caught_up_at, EXCLUDED.caught_up_at)
+    """,
+    # Claims reminders and advances each to its next occurrence in the same statement, so
+    # overlapping chunks or runs skip each other's rows instead of sending twice. The scheduler
+    # fires on its own clock, so it passes $2 seconds of grace to absorb skew with the DB.
+    "claim_reminders_by_id": _CLAIM_REMINDERS.format(
+        due="r.id = ANY($1::int[]) AND r.next_fire_at <= NOW() + make_interval(secs => $2)"
+    ),
+    "reschedule_user_reminders": """
+        UPDATE reminders
+        SET next_fire_at = reminder_next_fire_at(reminder_time, frequency, created_at::date, $2, NOW())
+        WHERE user_id = $1 AND status = 'active'
+    """,
+    # Skips reminders deleted while their slot was being delivered instead of failing the batch on the FK
+    "insert_reminder_history_batch": """
+        INSERT INTO reminder_history (reminder_id, user_id, delivery_status)
+        SELECT h.reminder_id, h.user_id, h.delivery_status
+        FROM unnest($1::int[], $2::uuid[], $3::text[]) AS h(reminder_id, user_id, delivery_status)
+        WHERE EXISTS (SELECT 1 FROM reminders r WHERE r.id = h.reminder_id)
+    """,
+}
+
+def _raw(conn):
+    # Bypass InstrumentedConnection so the call is recorded once, under its registered name
+    return conn.raw_connection if isinstance(conn, InstrumentedConnection) else conn
+
+async def _run(conn, name: str, args, method: str, rows: int = None):
+    # Registered statements report into the same per-label histograms as ad hoc SQL (db_metrics)
+    sql = QUERIES[name]
+    started = time.perf_counter()
+    try:
+        if method == "executemany":
+            return await _raw(conn).executemany(sql, args)
+        return await getattr(_raw(conn), method)(sql, *args)
+    finally:
+        record(name, sql, args, (time.perf_counter() - started) * 1000, rows=rows)
+
+async def fetch(conn, name: str, *args):
+    return await _run(conn, name, args, "fetch")
+
+async def fetchrow(conn, name: str, *args):
+    return await _run(conn, name, args, "fetchrow")
+
+async def fetchval(conn, name: str, *args):
+    return await _run(conn, name, args, "fetchval")
+
+async def execute(conn, name: str, *args) -> str:
+    """Run a statement and return its status tag (e.g. "DELETE 1"), like Connection.execute."""
+    return await _run(conn, name, args, "execute")
+
+async def executemany(conn, name: str, args_list):
+    args_list = list(args_list)
+    return await _run(conn, name, args_list, "executemany", rows=len(args_list))
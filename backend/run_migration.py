@@ -1,15 +1,25 @@
 # backend/run_migration.py
+# Usage: python -m backend.run_migration
 import asyncio
 import asyncpg
 import os
 from dotenv import load_dotenv
 
+from backend.migration import apply_migrations, get_schema_version
+
 load_dotenv()
 
 async def run_migration():
     conn = await asyncpg.connect(os.getenv("DATABASE_URL"))
-    await conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN DEFAULT FALSE;")
-    await conn.close()
-    print("✅ Migration completed!")
+    try:
+        before = await get_schema_version(conn)
+        after = await apply_migrations(conn)
+    finally:
+        await conn.close()
+    if after > before:
+        print(f"✅ Migrated schema from version {before} to {after}")
+    else:
+        print(f"✅ Schema already up to date (version {after})")
 
-asyncio.run(run_migration())
+if __name__ == "__main__":
+    asyncio.run(run_migration())
@@ -0,0 +1,130 @@
+# backend/services/notifications.py
+# Transactional outbox for emails sent from request handlers.
+#
+# Handlers call enqueue_email() on the connection they already hold, which is a single
+# INSERT, and return immediately. A background dispatcher in each API process claims due
+# rows with FOR UPDATE SKIP LOCKED, so several workers can share the table. It sends them
+# concurrently over the pooled EmailClient and retries failures with exponential backoff.
+import asyncio
+import logging
+import os
+import random
+
+from backend.database import get_connection
+from backend import queries
+from backend.utils.email import get_email_client
+
+NOTIFICATION_POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", 5))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", 20))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", 6))
+NOTIFICATION_BACKOFF_BASE = float(os.getenv("NOTIFICATION_BACKOFF_BASE", 30))
+NOTIFICATION_BACKOFF_MAX = float(os.getenv("NOTIFICATION_BACKOFF_MAX", 3600))
+# A claimed row becomes due again after this long, so a worker that dies mid-send doesn't lose it
+NOTIFICATION_LEASE_SECONDS = float(os.getenv("NOTIFICATION_LEASE_SECONDS", 120))
+
+logger = logging.getLogger(__name__)
+
+_dispatcher_task = None
+# Set once a queued row is committed, so rows queued by this process go out without waiting for the next poll
+_wakeup = asyncio.Event()
+
+def wake_dispatcher():
+    """Call after committing a transaction that queued notifications."""
+    _wakeup.set()
+
+async def enqueue_email(conn, to_email: str, subject: str, body: str):
+    """
+    Queue an email; commits (or rolls back) with whatever transaction `conn` is in.
+    Inside an explicit transaction the row is invisible to the dispatcher until commit,
+    so the caller calls wake_dispatcher() once the transaction block exits.
+    """
+    await queries.execute(conn, "enqueue_notification", "email", to_email, subject, body)
+    if not conn.is_in_transaction():
+        wake_dispatcher()
+
+def backoff_seconds(attempts: int) -> float:
+    # Full jitter keeps retries from a provider outage from arriving in lockstep
+    return random.uniform(0, min(NOTIFICATION_BACKOFF_MAX, NOTIFICATION_BACKOFF_BASE * 2 ** (attempts - 1)))
+
+async def _claim_due(conn) -> list:
+    return await conn.fetch('''
+        UPDATE notification_outbox
+        SET attempts = attempts + 1, next_attempt_at = NOW() + make_interval(secs => $2)
+        WHERE id IN (
+            SELECT id FROM notification_outbox
+            WHERE status = 'pending' AND next_attempt_at <= NOW()
+            ORDER BY next_attempt_at
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, channel, recipient, subject, body, attempts
+    ''', NOTIFICATION_BATCH_SIZE, NOTIFICATION_LEASE_SECONDS)
+
+async def dispatch_once() -> int:
+    """Deliver one batch of due notifications and return how many rows were claimed."""
+    async with get_connection() as conn:
+        rows = await _claim_due(conn)
+    if not rows:
+        return 0
+
+    # No connection is held while the provider calls are in flight
+    results = await get_email_client().send_many(
+        (row["recipient"], row["subject"], row["body"]) for row in rows
+    )
+    errors = [None if result.ok else result.error for result in results]
+
+    sent = [row["id"] for row, error in zip(rows, errors) if error is None]
+    retries, failures = [], []
+    for row, error in zip(rows, errors):
+        if error is None:
+            continue
+        if row["attempts"] >= NOTIFICATION_MAX_ATTEMPTS:
+            failures.append((row["id"], error))
+            logger.error(f"❌ Giving up on notification {row['id']} after {row['attempts']} attempts: {error}")
+        else:
+            retries.append((row["id"], error, backoff_seconds(row["attempts"])))
+            logger.warning(f"Notification {row['id']} failed (attempt {row['attempts']}), retrying: {error}")
+
+    async with get_connection() as conn:
+        if sent:
+            await conn.execute("DELETE FROM notification_outbox WHERE id = ANY($1::bigint[])", sent)
+        if retries:
+            await conn.executemany(
+                "UPDATE notification_outbox SET last_error = $2, next_attempt_at = NOW() + make_interval(secs => $3) WHERE id = $1",
+                retries
+            )
+        if failures:
+            await conn.executemany(
+                "UPDATE notification_outbox SET status = 'failed', last_error = $2 WHERE id = $1",
+                failures
+            )
+    return len(rows)
+
+async def _run_dispatcher():
+    while True:
+        try:
+            # A full batch means there is probably more waiting
+            if await dispatch_once() >= NOTIFICATION_BATCH_SIZE:
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Notification dispatcher error: {str(e)}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=NOTIFICATION_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+async def start_notification_dispatcher():
+    global _dispatcher_task
+    if _dispatcher_task is None:
+        _dispatcher_task = asyncio.create_task(_run_dispatcher())
+        logger.info("✅ Notification dispatcher started")
+
+async def stop_notification_dispatcher():
+    global _dispatcher_task
+    if _dispatcher_task is not None:
+        _dispatcher_task.cancel()
+        _dispatcher_task = None
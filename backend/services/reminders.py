@@ -1,81 +1,297 @@
 from fastapi import HTTPException
-from backend.database import get_db_connection
+from backend.database import get_connection, get_read_connection, mark_user_write
+from backend import queries
 from backend.auth import User
 from backend.models.reminders import ReminderCreate
+from pydantic import ValidationError
+import base64
+import codecs
+import csv
+import json
 import logging
+import os
+from datetime import datetime
+
+REMINDER_IMPORT_MAX_ROWS = int(os.getenv("REMINDER_IMPORT_MAX_ROWS", 5000))
+REMINDER_IMPORT_MAX_BYTES = int(os.getenv("REMINDER_IMPORT_MAX_BYTES", 1024 * 1024))
 
 logger = logging.getLogger(__name__)
 
 # Existing: Create Reminder
 async def create_reminder(reminder: ReminderCreate, user: User):
-    conn = await get_db_connection()
     try:
-        logger.info(f"Running query: INSERT INTO reminders with values: {user.id}, {reminder.medicine}, {reminder.reminder_time}, {reminder.frequency}")
-        result = await conn.fetchrow(
-            "INSERT INTO reminders (user_id, medicine, reminder_time, frequency) VALUES ($1, $2, $3, $4) RETURNING id",
-            user.id, reminder.medicine, reminder.reminder_time, reminder.frequency
-        )
-        return {"message": "Reminder set successfully", "reminder_id": result["id"]}
+        async with get_connection() as conn:
+            logger.info(f"Running query: INSERT INTO reminders with values: {user.id}, {reminder.medicine}, {reminder.reminder_time}, {reminder.frequency}")
+            result = await queries.fetchrow(
+                conn, "insert_reminder",
+                user.id, reminder.medicine, reminder.reminder_time, reminder.frequency
+            )
+            await mark_user_write(user.id)
+            return {"message": "Reminder set successfully", "reminder_id": result["id"]}
     except Exception as e:
         logger.error(f"Failed to create reminder: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to set reminder")
-    finally:
-        await conn.close()
 
 # ✅ GET reminders for current user
 async def get_reminders(user: User):
-    conn = await get_db_connection()
-    try:
-        reminders = await conn.fetch(
-            "SELECT id, medicine, reminder_time, frequency, status, created_at FROM reminders WHERE user_id = $1 ORDER BY created_at DESC",
-            user.id
-        )
+    async with get_read_connection(user.id) as conn:
+        reminders = await queries.fetch(conn, "user_reminders", user.id)
         return [dict(r) for r in reminders]
-    finally:
-        await conn.close()
 
 # ✅ DELETE a reminder
 async def delete_reminder(reminder_id: int, user: User):
-    conn = await get_db_connection()
-    try:
-        result = await conn.execute(
-            "DELETE FROM reminders WHERE id = $1 AND user_id = $2",
-            reminder_id, user.id
-        )
+    async with get_connection() as conn:
+        result = await queries.execute(conn, "delete_reminder", reminder_id, user.id)
         if result == "DELETE 0":
             raise HTTPException(status_code=404, detail="Reminder not found or not yours")
+        await mark_user_write(user.id)
         return {"message": f"Reminder {reminder_id} deleted successfully"}
-    finally:
-        await conn.close()
+
+# 📥 Bulk import: the body is read as a stream and rows are parsed and validated one at a time, so
+# only the valid reminders are held in memory, then loaded with one COPY. Both the body size and
+# the row count are capped while reading. All or nothing: any invalid row rejects the whole
+# import, so a corrected file can simply be resent.
+async def _read_limited(chunks, content_length: str = None):
+    """Yield body chunks, rejecting the request once it exceeds REMINDER_IMPORT_MAX_BYTES."""
+    too_large = HTTPException(status_code=413, detail=f"Imports are limited to {REMINDER_IMPORT_MAX_BYTES} bytes")
+    if content_length and content_length.isdigit() and int(content_length) > REMINDER_IMPORT_MAX_BYTES:
+        raise too_large
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > REMINDER_IMPORT_MAX_BYTES:
+            raise too_large
+        yield chunk
+
+async def _decoded(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        async for chunk in chunks:
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Import must be UTF-8 encoded")
+
+async def _lines(chunks):
+    pending = ""
+    async for text in _decoded(chunks):
+        pending += text
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    if pending:
+        yield pending.rstrip("\r")
+
+async def _csv_records(chunks):
+    record = []
+    async for line in _lines(chunks):
+        record.append(line)
+        # A quoted field may span lines; the record is complete once its quotes balance
+        text = "\n".join(record)
+        if text.count('"') % 2 == 0:
+            record = []
+            if text.strip():
+                yield next(csv.reader([text]))
+    if record:
+        raise HTTPException(status_code=400, detail="Unterminated quoted field in CSV import")
+
+async def _json_array_items(chunks):
+    """Yield the elements of a top-level JSON array, decoding each as soon as it is complete."""
+    invalid = HTTPException(status_code=400, detail="Import must be a JSON array, JSON lines or CSV")
+    decoder = json.JSONDecoder()
+    buffer, position = "", 0
+    started = finished = eof = False
+    expect_value, count = True, 0
+    texts = _decoded(chunks)
+    while not finished:
+        if not eof:
+            try:
+                buffer = buffer[position:] + await texts.__anext__()
+                position = 0
+            except StopAsyncIteration:
+                eof = True
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise invalid
+                started, position = True, position + 1
+                continue
+            if buffer[position] == "]" and (not expect_value or count == 0):
+                finished, position = True, position + 1
+                break
+            if not expect_value:
+                if buffer[position] != ",":
+                    raise invalid
+                position, expect_value = position + 1, True
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise invalid
+                break
+            if end == len(buffer) and not eof:
+                # A number or literal may continue in the next chunk
+                break
+            yield item
+            position, expect_value, count = end, False, count + 1
+        if eof and not finished:
+            raise invalid
+    if buffer[position:].strip():
+        raise invalid
+    async for text in texts:
+        if text.strip():
+            raise invalid
+
+async def parse_reminder_import(chunks, content_type: str):
+    """
+    Yield raw reminder rows from a CSV (medicine,reminder_time,frequency header), JSON lines
+    (application/x-ndjson) or JSON array body, given as an async iterator of byte chunks.
+    """
+    if "csv" in content_type:
+        header = None
+        async for values in _csv_records(chunks):
+            if header is None:
+                header = [key.strip() for key in values]
+                continue
+            # Empty cells fall back to the model defaults
+            yield {key: value.strip() for key, value in zip(header, values) if key and value and value.strip()}
+        return
+
+    if "ndjson" in content_type or "jsonl" in content_type:
+        async for line in _lines(chunks):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=400, detail="Each line of a JSON lines import must be a JSON object")
+        return
+
+    async for item in _json_array_items(chunks):
+        yield item
+
+async def validate_reminder_import(rows):
+    valid, errors = [], []
+    number = 0
+    async for row in rows:
+        number += 1
+        if number > REMINDER_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"Imports are limited to {REMINDER_IMPORT_MAX_ROWS} reminders")
+        if not isinstance(row, dict):
+            errors.append({"row": number, "errors": [{"field": None, "message": "Expected an object"}]})
+            continue
+        try:
+            valid.append(ReminderCreate(**row))
+        except ValidationError as e:
+            errors.append({
+                "row": number,
+                "errors": [{"field": ".".join(str(part) for part in err["loc"]), "message": err["msg"]} for err in e.errors()],
+            })
+    return valid, errors
+
+async def import_reminders(chunks, content_type: str, content_length: str, user: User):
+    reminders, errors = await validate_reminder_import(
+        parse_reminder_import(_read_limited(chunks, content_length), content_type)
+    )
+    if errors:
+        raise HTTPException(status_code=422, detail={"message": f"{len(errors)} invalid rows, nothing imported", "errors": errors})
+    if not reminders:
+        raise HTTPException(status_code=400, detail="No reminders to import")
+
+    try:
+        async with get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute('''
+                    CREATE TEMP TABLE reminder_import (
+                        position INT, medicine TEXT, reminder_time TIME, frequency TEXT
+                    ) ON COMMIT DROP
+                ''')
+                await conn.copy_records_to_table(
+                    "reminder_import",
+                    records=[(i, r.medicine, r.reminder_time, r.frequency) for i, r in enumerate(reminders)],
+                    columns=["position", "medicine", "reminder_time", "frequency"],
+                )
+                # next_fire_at needs the owner's time zone, so the rows go through one INSERT ... SELECT
+                # from the COPY target rather than straight into reminders
+                rows = await conn.fetch('''
+                    INSERT INTO reminders (user_id, medicine, reminder_time, frequency, next_fire_at)
+                    SELECT $1::uuid, i.medicine, i.reminder_time, i.frequency,
+                           reminder_next_fire_at(i.reminder_time, i.frequency, CURRENT_DATE, tz.timezone, NOW())
+                    FROM reminder_import i
+                    CROSS JOIN (
+                        SELECT COALESCE((SELECT timezone FROM users WHERE id = $1::uuid), 'Europe/Berlin') AS timezone
+                    ) tz
+                    ORDER BY i.position
+                    RETURNING id
+                ''', user.id)
+        await mark_user_write(user.id)
+    except Exception as e:
+        logger.error(f"Failed to import reminders: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to import reminders")
+
+    logger.info(f"✅ Imported {len(rows)} reminders for user {user.id}")
+    return {"message": f"Imported {len(rows)} reminders", "reminder_ids": [r["id"] for r in rows]}
         
         
         
-async def get_reminder_history(user: User):
-    conn = await get_db_connection()
+def encode_history_cursor(sent_at: datetime, history_id: int) -> str:
+    raw = f"{sent_at.isoformat()}|{history_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str):
     try:
-        records = await conn.fetch(
-            "SELECT * FROM reminder_history WHERE user_id = $1 ORDER BY sent_at DESC",
-            user.id
-        )
-        return [dict(r) for r in records]
-    finally:
-        await conn.close()
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sent_at, history_id = raw.split("|")
+        return datetime.fromisoformat(sent_at), int(history_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# ✅ GET one page of reminder history, newest first
+async def get_reminder_history(user: User, limit: int = 50, cursor: str = None):
+    async with get_read_connection(user.id) as conn:
+        # One extra row tells us whether there is another page
+        if cursor:
+            sent_at, history_id = decode_history_cursor(cursor)
+            records = await queries.fetch(
+                conn, "user_reminder_history_after", user.id, sent_at, history_id, limit + 1
+            )
+        else:
+            records = await queries.fetch(conn, "user_reminder_history", user.id, limit + 1)
+    items = [dict(r) for r in records[:limit]]
+    next_cursor = None
+    if len(records) > limit:
+        next_cursor = encode_history_cursor(items[-1]["sent_at"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor}
 
 
 
 
 
 async def log_reminder_history(reminder_id: int, user_id: str, status: str = "sent"):
-    conn = await get_db_connection()
     try:
-        await conn.execute(
-            "INSERT INTO reminder_history (reminder_id, user_id, delivery_status) VALUES ($1, $2, $3)",
-            reminder_id, user_id, status
-        )
+        async with get_connection() as conn:
+            await queries.execute(conn, "insert_reminder_history", reminder_id, user_id, status)
     except Exception as e:
         logger.error(f"Failed to log reminder history: {str(e)}")
-    finally:
-        await conn.close()
+
+async def log_reminder_history_batch(entries):
+    """Record (reminder_id, user_id, status) tuples with a single INSERT."""
+    entries = list(entries)
+    if not entries:
+        return
+    reminder_ids, user_ids, statuses = (list(column) for column in zip(*entries))
+    try:
+        async with get_connection() as conn:
+            await queries.execute(conn, "insert_reminder_history_batch", reminder_ids, user_ids, statuses)
+    except Exception as e:
+        logger.error(f"Failed to log reminder history for {len(entries)} reminders: {str(e)}")
         
 
 
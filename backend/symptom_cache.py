@@ -0,0 +1,109 @@
+# backend/symptom_cache.py
+# Cache of analyze_symptoms completions. Most requests are one of a handful of symptom
+# combinations, so the model's answer is keyed on the normalized symptom set plus the
+# prompt version and reused instead of paying for an identical completion.
+#
+# Tier 1 is an in-process TTL/LRU cache. When SYMPTOM_CACHE_REDIS_URL is set, Redis is a
+# shared tier 2 so every worker benefits from a completion made by any of them.
+# Bump SYMPTOM_PROMPT_VERSION whenever the prompt or model changes.
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+SYMPTOM_CACHE_TTL = float(os.getenv("SYMPTOM_CACHE_TTL", 24 * 3600))
+SYMPTOM_CACHE_MAX_SIZE = int(os.getenv("SYMPTOM_CACHE_MAX_SIZE", 5000))
+SYMPTOM_CACHE_REDIS_URL = os.getenv("SYMPTOM_CACHE_REDIS_URL")
+
+REDIS_KEY_PREFIX = "symptoms:"
+
+logger = logging.getLogger(__name__)
+
+_local = TTLCache(maxsize=SYMPTOM_CACHE_MAX_SIZE, ttl=SYMPTOM_CACHE_TTL)
+# Cache key -> completion already being computed, so concurrent identical requests share one call
+_in_flight = {}
+_stats = Counter()
+_redis = None
+
+def _get_redis():
+    global _redis
+    if SYMPTOM_CACHE_REDIS_URL and _redis is None:
+        import redis.asyncio as redis
+        _redis = redis.from_url(SYMPTOM_CACHE_REDIS_URL, decode_responses=True)
+    return _redis
+
+def normalize_symptoms(symptoms) -> list:
+    """Lower-cased, whitespace-collapsed, de-duplicated and sorted symptoms."""
+    return sorted({" ".join(s.lower().split()) for s in symptoms if s and s.strip()})
+
+def cache_key(symptoms: list, prompt_version: str) -> str:
+    digest = hashlib.sha256(json.dumps([prompt_version, symptoms]).encode()).hexdigest()
+    return f"{REDIS_KEY_PREFIX}{prompt_version}:{digest}"
+
+async def get(key: str):
+    """Cached value for `key` from either tier, or None. Counts a hit or a miss."""
+    value = _local.get(key)
+    if value is not None:
+        _stats["local_hits"] += 1
+        return value
+
+    client = _get_redis()
+    if client is not None:
+        try:
+            cached = await client.get(key)
+            if cached:
+                value = json.loads(cached)
+                _local[key] = value
+                _stats["redis_hits"] += 1
+                return value
+        except Exception as e:
+            logger.warning(f"Symptom cache Redis read failed: {str(e)}")
+
+    _stats["misses"] += 1
+    return None
+
+async def put(key: str, value: dict):
+    _local[key] = value
+    client = _get_redis()
+    if client is not None:
+        try:
+            await client.set(key, json.dumps(value), ex=int(SYMPTOM_CACHE_TTL))
+        except Exception as e:
+            logger.warning(f"Symptom cache Redis write failed: {str(e)}")
+
+async def get_or_compute(key: str, compute) -> dict:
+    """Return the cached value for `key`, or await `compute()` and cache what it returns."""
+    pending = _in_flight.get(key)
+    if pending is not None:
+        _stats["coalesced"] += 1
+        return await asyncio.shield(pending)
+
+    value = await get(key)
+    if value is not None:
+        return value
+
+    future = asyncio.ensure_future(compute())
+    _in_flight[key] = future
+    try:
+        value = await asyncio.shield(future)
+    finally:
+        _in_flight.pop(key, None)
+    await put(key, value)
+    return value
+
+def get_cache_stats() -> dict:
+    lookups = sum(_stats[k] for k in ("local_hits", "redis_hits", "coalesced", "misses"))
+    hits = lookups - _stats["misses"]
+    return {
+        **{k: _stats[k] for k in ("local_hits", "redis_hits", "coalesced", "misses")},
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "size": len(_local),
+        "max_size": SYMPTOM_CACHE_MAX_SIZE,
+        "ttl_seconds": SYMPTOM_CACHE_TTL,
+        "redis": bool(SYMPTOM_CACHE_REDIS_URL),
+    }
@@ -0,0 +1,142 @@
+# backend/tasks/maintenance.py
+# Housekeeping for the tables that only ever grow. Both are partitioned by month, so old data
+# goes away a partition at a time:
+#
+# - refresh_tokens (migration 007) gains a row on every login, Google sign-in and refresh. Each
+#   run creates the upcoming partitions, drops the ones whose every token has expired, and
+#   deletes revoked or expired rows from the remaining partitions in bounded batches.
+# - reminder_history (migration 011) gains a row per reminder delivery. Partitions older than
+#   REMINDER_HISTORY_RETENTION_MONTHS are optionally archived to CSV and then dropped.
+import asyncpg
+import logging
+import os
+import re
+from datetime import datetime
+
+from backend.database import get_connection
+from backend.tasks.tasks import celery, run_async
+
+REFRESH_TOKEN_PARTITIONS_AHEAD = int(os.getenv("REFRESH_TOKEN_PARTITIONS_AHEAD", 3))
+REFRESH_TOKEN_REAP_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_REAP_BATCH_SIZE", 5000))
+# Caps one run; anything left over is picked up by the next one
+REFRESH_TOKEN_REAP_MAX_BATCHES = int(os.getenv("REFRESH_TOKEN_REAP_MAX_BATCHES", 100))
+# DROP TABLE needs an exclusive lock on the parent table; give up rather than stall requests behind it
+PARTITION_DROP_LOCK_TIMEOUT = os.getenv("REFRESH_TOKEN_PARTITION_DROP_LOCK_TIMEOUT", "2s")
+
+REMINDER_HISTORY_RETENTION_MONTHS = int(os.getenv("REMINDER_HISTORY_RETENTION_MONTHS", 12))
+REMINDER_HISTORY_PARTITIONS_AHEAD = int(os.getenv("REMINDER_HISTORY_PARTITIONS_AHEAD", 3))
+# When set, each expiring partition is written to <dir>/<partition>.csv before it is dropped
+REMINDER_HISTORY_ARCHIVE_DIR = os.getenv("REMINDER_HISTORY_ARCHIVE_DIR")
+
+PARTITION_NAME_PATTERN = re.compile(r"^\w+_p(\d{4})(\d{2})$")
+
+logger = logging.getLogger(__name__)
+
+def _partition_end(name: str):
+    """Exclusive upper bound of a monthly partition, or None for anything else (e.g. the default)."""
+    match = PARTITION_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    return datetime(year + month // 12, month % 12 + 1, 1)
+
+async def _partitions_ending_by(conn, parent: str, cutoff: datetime) -> list:
+    rows = await conn.fetch('''
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = $1::regclass
+    ''', parent)
+    ended = []
+    for row in rows:
+        end = _partition_end(row["relname"])
+        if end is not None and end <= cutoff:
+            ended.append(row["relname"])
+    return sorted(ended)
+
+async def _drop_partition(conn, parent: str, name: str) -> bool:
+    try:
+        async with conn.transaction():
+            await conn.execute(f"SET LOCAL lock_timeout = '{PARTITION_DROP_LOCK_TIMEOUT}'")
+            await conn.execute(f'DROP TABLE "{name}"')
+        return True
+    except asyncpg.LockNotAvailableError:
+        logger.warning(f"Skipped dropping {name}: {parent} is busy, retrying next run")
+        return False
+
+async def drop_expired_partitions(conn) -> list:
+    # expires_at is stored as naive UTC (datetime.utcnow() at issue time)
+    expired = await _partitions_ending_by(conn, "refresh_tokens", datetime.utcnow())
+    return [name for name in expired if await _drop_partition(conn, "refresh_tokens", name)]
+
+async def _delete_in_batches(conn, where: str) -> int:
+    deleted = 0
+    for _ in range(REFRESH_TOKEN_REAP_MAX_BATCHES):
+        status = await conn.execute(f'''
+            DELETE FROM refresh_tokens WHERE (id, expires_at) IN (
+                SELECT id, expires_at FROM refresh_tokens WHERE {where} LIMIT $1
+            )
+        ''', REFRESH_TOKEN_REAP_BATCH_SIZE)
+        count = int(status.split()[-1])
+        deleted += count
+        if count < REFRESH_TOKEN_REAP_BATCH_SIZE:
+            break
+    return deleted
+
+async def reap_refresh_tokens_async() -> dict:
+    # Each statement runs in its own implicit transaction so row locks are held one batch at a time
+    async with get_connection() as conn:
+        try:
+            await conn.execute("SELECT ensure_refresh_token_partitions($1)", REFRESH_TOKEN_PARTITIONS_AHEAD)
+        except asyncpg.PostgresError as e:
+            # Typically rows for that month already sitting in the default partition
+            logger.error(f"❌ Failed to create refresh_tokens partitions: {str(e)}")
+
+        dropped = await drop_expired_partitions(conn)
+        expired = await _delete_in_batches(conn, "expires_at <= NOW()")
+        revoked = await _delete_in_batches(conn, "revoked = TRUE")
+    return {"dropped_partitions": dropped, "expired_deleted": expired, "revoked_deleted": revoked}
+
+@celery.task
+def reap_refresh_tokens():
+    result = run_async(reap_refresh_tokens_async())
+    logger.info(
+        f"🧹 Reaped refresh tokens: dropped {len(result['dropped_partitions'])} partitions, "
+        f"deleted {result['expired_deleted']} expired and {result['revoked_deleted']} revoked rows"
+    )
+    return result
+
+async def prune_reminder_history_async() -> dict:
+    async with get_connection() as conn:
+        try:
+            await conn.execute(
+                "SELECT ensure_monthly_partitions('reminder_history', NOW()::date, "
+                "(NOW() + make_interval(months => $1))::date)",
+                REMINDER_HISTORY_PARTITIONS_AHEAD
+            )
+        except asyncpg.PostgresError as e:
+            logger.error(f"❌ Failed to create reminder_history partitions: {str(e)}")
+
+        # sent_at is CURRENT_TIMESTAMP stored in a naive TIMESTAMP, i.e. wall-clock time in the
+        # session time zone; partition bounds follow it, so the cutoff is taken from LOCALTIMESTAMP too
+        cutoff = await conn.fetchval(
+            "SELECT date_trunc('month', LOCALTIMESTAMP) - make_interval(months => $1)",
+            REMINDER_HISTORY_RETENTION_MONTHS
+        )
+        archived, dropped = [], []
+        for name in await _partitions_ending_by(conn, "reminder_history", cutoff):
+            if REMINDER_HISTORY_ARCHIVE_DIR:
+                os.makedirs(REMINDER_HISTORY_ARCHIVE_DIR, exist_ok=True)
+                path = os.path.join(REMINDER_HISTORY_ARCHIVE_DIR, f"{name}.csv")
+                await conn.copy_from_table(name, output=path, format="csv", header=True)
+                archived.append(path)
+            if await _drop_partition(conn, "reminder_history", name):
+                dropped.append(name)
+    return {"archived": archived, "dropped_partitions": dropped}
+
+@celery.task
+def prune_reminder_history():
+    result = run_async(prune_reminder_history_async())
+    logger.info(
+        f"🧹 Pruned reminder history: archived {len(result['archived'])} and "
+        f"dropped {len(result['dropped_partitions'])} partitions"
+    )
+    return result
@@ -0,0 +1,140 @@
+# backend/tasks/scheduler.py
+# Usage: python -m backend.tasks.scheduler
+#
+# Optional companion to Celery beat. It keeps every active reminder that falls due in the next
+# SCHEDULER_WINDOW_MINUTES in a min-heap and dispatches fire_reminders at each reminder's exact
+# time, instead of leaving it to the once-a-minute check_reminders sweep.
+#
+# The heap is loaded from the next_fire_at index and then kept current through the
+# reminders_changed LISTEN channel (migrations 010/014), so creates, deletes, status changes and
+# reschedules to an earlier time show up without rescanning the table. Claims, which only push
+# next_fire_at later, don't notify; the reload picks those up. check_reminders keeps running as
+# the safety net.
+# Both go through the same claim statement, so a reminder is never delivered twice.
+import asyncio
+import asyncpg
+import heapq
+import json
+import logging
+import os
+import time
+
+from backend.database import DATABASE_URL
+from backend.tasks.tasks import fire_reminders
+
+SCHEDULER_WINDOW_MINUTES = float(os.getenv("SCHEDULER_WINDOW_MINUTES", 10))
+SCHEDULER_DISPATCH_BATCH_SIZE = int(os.getenv("SCHEDULER_DISPATCH_BATCH_SIZE", 500))
+# Lets fire_reminders claim rows whose next_fire_at is a moment ahead of the DB clock
+SCHEDULER_GRACE_SECONDS = float(os.getenv("SCHEDULER_GRACE_SECONDS", 2))
+
+REMINDER_CHANNEL = "reminders_changed"
+
+logger = logging.getLogger(__name__)
+
+class ReminderScheduler:
+    """Timer heap of (fire_at, reminder_id); cancelled or rescheduled entries are skipped lazily."""
+
+    def __init__(self, window_seconds: float, dispatch):
+        self.window_seconds = window_seconds
+        self.dispatch = dispatch
+        self._heap = []
+        # reminder id -> the fire time currently scheduled; anything else in the heap is stale
+        self._fire_at = {}
+        self._horizon = 0.0
+        self._changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self._fire_at)
+
+    def schedule(self, reminder_id: int, fire_at: float):
+        if fire_at is None or fire_at > self._horizon:
+            # Outside the window: the next reload picks it up
+            self._fire_at.pop(reminder_id, None)
+            return
+        if self._fire_at.get(reminder_id) == fire_at:
+            return
+        self._fire_at[reminder_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, reminder_id))
+        if self._heap[0] == (fire_at, reminder_id):
+            # New earliest entry: wake the timer so it doesn't oversleep
+            self._changed.set()
+
+    def pop_due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, reminder_id = heapq.heappop(self._heap)
+            if self._fire_at.get(reminder_id) == fire_at:
+                del self._fire_at[reminder_id]
+                due.append(reminder_id)
+        return due
+
+    def _next_fire_at(self):
+        while self._heap and self._fire_at.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    async def load(self, conn):
+        """(Re)load the window from the next_fire_at index."""
+        self._horizon = time.time() + self.window_seconds
+        rows = await conn.fetch('''
+            SELECT id, EXTRACT(EPOCH FROM next_fire_at)::float8 AS fire_at FROM reminders
+            WHERE status = 'active' AND next_fire_at <= NOW() + make_interval(secs => $1)
+        ''', self.window_seconds)
+        for row in rows:
+            self.schedule(row["id"], row["fire_at"])
+        self._changed.set()
+        return len(rows)
+
+    def on_notification(self, connection, pid, channel, payload):
+        change = json.loads(payload)
+        self.schedule(change["id"], change["next_fire_at"])
+
+    async def run_timer(self):
+        while True:
+            next_fire_at = self._next_fire_at()
+            timeout = self.window_seconds if next_fire_at is None else max(0.0, next_fire_at - time.time())
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+
+            due = self.pop_due(time.time())
+            for i in range(0, len(due), SCHEDULER_DISPATCH_BATCH_SIZE):
+                await self.dispatch(due[i:i + SCHEDULER_DISPATCH_BATCH_SIZE])
+
+async def dispatch_to_celery(reminder_ids: list):
+    # apply_async blocks on the broker round trip
+    await asyncio.to_thread(fire_reminders.delay, reminder_ids, SCHEDULER_GRACE_SECONDS)
+    logger.info(f"⏰ Dispatched {len(reminder_ids)} reminders")
+
+async def run_scheduler():
+    scheduler = ReminderScheduler(SCHEDULER_WINDOW_MINUTES * 60, dispatch_to_celery)
+    timer = asyncio.create_task(scheduler.run_timer())
+    try:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(DATABASE_URL)
+                # Listen before loading so no change slips between the two
+                await conn.add_listener(REMINDER_CHANNEL, scheduler.on_notification)
+                while True:
+                    count = await scheduler.load(conn)
+                    logger.info(f"✅ Scheduler loaded {count} reminders due in the next {SCHEDULER_WINDOW_MINUTES:g} minutes")
+                    # Reload at half the window so the heap always covers at least half a window ahead
+                    await asyncio.sleep(scheduler.window_seconds / 2)
+                    if timer.done():
+                        timer.result()
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                # Notifications sent while disconnected are lost; the reload on reconnect covers them
+                logger.warning(f"Scheduler database connection lost: {str(e)}")
+                await asyncio.sleep(5)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+    finally:
+        timer.cancel()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_scheduler())
@@ -1,13 +1,17 @@
-from celery import Celery
-from backend.database import get_db_connection
-from backend.utils.email import send_email
-from backend.utils.sms import send_sms_notification
-from backend.services.reminders import log_reminder_history
+from celery import Celery, chord
+from celery.signals import worker_process_shutdown
+from collections import Counter, defaultdict
+from backend.database import get_connection, close_pool
+from backend import queries
+from backend.utils.email import get_email_client, close_email_client
+from backend.utils.sms import send_sms_async
+from backend.services.reminders import log_reminder_history_batch
 from datetime import datetime
 import asyncio
 import logging
-import pytz
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,89 +21,236 @@ load_dotenv(os.path.join(BASE_DIR, "../.env"))  # Adjusted path to reach .env in
 # Configuration from environment variables
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+# Fan-out: due reminders are split by a hash of the user id into shards, then into chunks per task
+REMINDER_FANOUT_LIMIT = int(os.getenv("REMINDER_FANOUT_LIMIT", 100_000))
+REMINDER_SHARDS = int(os.getenv("REMINDER_SHARDS", 16))
+REMINDER_CHUNK_SIZE = int(os.getenv("REMINDER_CHUNK_SIZE", 250))
+REMINDER_PROGRESS_EVERY = int(os.getenv("REMINDER_PROGRESS_EVERY", 50))
+# Reminders in flight at once within one task (email/SMS clients apply their own limits too)
+REMINDER_SEND_CONCURRENCY = int(os.getenv("REMINDER_SEND_CONCURRENCY", 50))
+# Catch-up: once the last run that left nothing overdue is older than REMINDER_CATCHUP_AFTER_SECONDS
+# (worker or beat downtime), reminders missed by more than that are drained at most
+# REMINDER_CATCHUP_PER_RUN per run, spread over the interval until the next run
+REMINDER_CATCHUP_AFTER_SECONDS = float(os.getenv("REMINDER_CATCHUP_AFTER_SECONDS", 180))
+REMINDER_CATCHUP_PER_RUN = int(os.getenv("REMINDER_CATCHUP_PER_RUN", 2000))
+CHECK_REMINDERS_INTERVAL = 60.0
 
-celery = Celery("reminders", broker="redis://localhost:6379/0")
+REMINDER_WATERMARK = "check_reminders"
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+# Needed for chords (check_reminders' aggregation) and chunk progress
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+
+celery = Celery(
+    "reminders",
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND,
+    include=["backend.tasks.maintenance"],
+)
 logger = logging.getLogger(__name__)
 
+# One event loop per worker process, running on its own thread for the life of the process.
+# The asyncpg pool, the email client and the SMS executor are all created on it once and
+# reused by every task, and tasks running on several pool threads share it concurrently.
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    global _loop, _loop_pid
+    with _loop_lock:
+        # A loop inherited across fork (prefork pool) has no thread driving it
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="worker-event-loop", daemon=True).start()
+            _loop_pid = os.getpid()
+        return _loop
+
 def run_async(coro):
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(coro)
+    """Run `coro` on this worker process's event loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
 
-@celery.task
-def check_reminders():
-    local_tz = pytz.timezone("Europe/Berlin")
-    now = datetime.now(local_tz).strftime("%H:%M")
-    logger.info(f"📅 Checking reminders at {now}")
-
-    reminders = run_async(get_due_reminders(now))
-
-    for r in reminders:
-        try:
-            user = run_async(get_user_email_and_phone(r["user_id"]))
-            if user:
-                status = []
-                
-                subject = f"Health Reminder: Take your {r['medicine']} at {r['reminder_time']}"
-                body = (
-                    f"Hello,\n\n"
-                    f"This is your scheduled health reminder from Health Assistant.\n\n"
-                    f"💊 Medicine: {r['medicine']}\n"
-                    f"⏰ Time: {r['reminder_time']}\n\n"
-                    f"For more details, visit {BASE_URL}/health-assistant\n\n"
-                    "Stay healthy and take care!\n"
-                    "— Your Health Assistant Team\n\n"
-                    "You received this reminder because you opted in via our app."
-                )
-
-                if user["preferred_notification"] in ("email", "both"):
-                    send_email(
-                        to_email=user["email"],
-                        subject=subject,
-                        body=body
-                    )
-                    status.append("email")
-
-                if user["preferred_notification"] in ("sms", "both") and user.get("phone"):
-                    send_sms_notification(
-                        to_number=user["phone"],
-                        body=f"💊 Reminder: Take {r['medicine']} at {r['reminder_time']}"
-                    )
-                    status.append("sms")
-
-                final_status = "-".join(status) + "-sent" if status else "no-delivery"
-                run_async(log_reminder_history(reminder_id=r["id"], user_id=r["user_id"], status=final_status))
-            else:
-                run_async(log_reminder_history(reminder_id=r["id"], user_id=r["user_id"], status="user-not-found"))
-        except Exception as e:
-            logger.error(f"❌ Failed to send reminder: {e}")
-            run_async(log_reminder_history(reminder_id=r["id"], user_id=r["user_id"], status="failed"))
-
-# 🔍 Get reminders due now
-async def get_due_reminders(current_time: str):
-    conn = await get_db_connection()
+@worker_process_shutdown.connect
+def _close_worker_loop(**kwargs):
+    if _loop is None or _loop_pid != os.getpid():
+        return
     try:
-        return await conn.fetch(
-            "SELECT * FROM reminders WHERE reminder_time::text LIKE $1 AND status = 'active'",
-            f"{current_time}%"
-        )
+        run_async(close_pool())
+        run_async(close_email_client())
     finally:
-        await conn.close()
+        _loop.call_soon_threadsafe(_loop.stop)
 
-# 👤 Fetch email, phone, preference
-async def get_user_email_and_phone(user_id: str):
-    conn = await get_db_connection()
-    try:
-        return await conn.fetchrow(
-            "SELECT email, phone, preferred_notification FROM users WHERE id = $1",
-            user_id
+@celery.task
+def check_reminders():
+    logger.info(f"📅 Checking reminders at {datetime.utcnow().strftime('%H:%M')} UTC")
+    run = run_async(get_reminder_run_state())
+    lag = run["lag_seconds"]
+    if lag is not None and lag > REMINDER_CATCHUP_AFTER_SECONDS:
+        due = run_async(get_recent_reminder_shards(REMINDER_FANOUT_LIMIT, REMINDER_SHARDS, REMINDER_CATCHUP_AFTER_SECONDS))
+        missed = run_async(get_missed_reminder_shards(REMINDER_CATCHUP_PER_RUN, REMINDER_SHARDS, REMINDER_CATCHUP_AFTER_SECONDS))
+        caught_up = len(missed) < REMINDER_CATCHUP_PER_RUN
+        logger.warning(f"⏰ Catching up {len(missed)} missed reminders, last caught up {lag:.0f}s ago")
+    else:
+        due = run_async(get_due_reminder_shards(REMINDER_FANOUT_LIMIT, REMINDER_SHARDS))
+        missed, caught_up = [], True
+
+    # The watermark only moves once everything due at this run has been handed out
+    caught_up_at = run["now"] if caught_up else None
+    if not due and not missed:
+        if caught_up_at is not None:
+            run_async(advance_reminder_watermark(caught_up_at))
+        return
+
+    signatures = [deliver_reminder_chunk.s(chunk) for chunk in build_reminder_chunks(due, REMINDER_CHUNK_SIZE)]
+    missed_chunks = build_reminder_chunks(missed, REMINDER_CHUNK_SIZE)
+    signatures += [
+        deliver_reminder_chunk.s(chunk).set(countdown=i * CHECK_REMINDERS_INTERVAL / len(missed_chunks))
+        for i, chunk in enumerate(missed_chunks)
+    ]
+    # Chunks run in parallel across workers; the callback gets every chunk's status counts
+    total = len(due) + len(missed)
+    summary = chord(signatures)(summarize_reminder_run.s(time.time(), total, caught_up_at))
+    logger.info(f"📤 Fanned out {total} reminders in {len(signatures)} chunks")
+    # Id of the summarize_reminder_run result, for following a run from outside
+    return summary.id
+
+def build_reminder_chunks(due, chunk_size: int) -> list:
+    """Group (id, shard) rows by shard, then split each shard into chunks of at most chunk_size ids."""
+    shards = defaultdict(list)
+    for row in due:
+        shards[row["shard"]].append(row["id"])
+    return [ids[i:i + chunk_size] for ids in shards.values() for i in range(0, len(ids), chunk_size)]
+
+@celery.task(bind=True)
+def deliver_reminder_chunk(self, reminder_ids, grace_seconds: float = 0):
+    # Each chunk claims its own rows, so a chunk redelivered by the broker or overlapping
+    # with the scheduler service skips whatever was already sent
+    def report_progress(done: int, total: int):
+        if not self.request.called_directly:
+            self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+
+    return run_async(claim_and_deliver(reminder_ids, grace_seconds, on_progress=report_progress))
+
+@celery.task
+def summarize_reminder_run(chunk_results, started_at: float, total: int, caught_up_at: float = None):
+    # Only runs once every chunk succeeded, so a failed run leaves the watermark behind
+    # and the next check_reminders picks up what it missed
+    statuses = Counter()
+    for result in chunk_results:
+        statuses.update(result)
+    if caught_up_at is not None:
+        run_async(advance_reminder_watermark(caught_up_at))
+    elapsed = time.time() - started_at
+    logger.info(f"✅ Delivered {sum(statuses.values())}/{total} reminders in {elapsed:.1f}s: {dict(statuses)}")
+    return {"total": total, "elapsed_seconds": elapsed, "statuses": dict(statuses)}
+
+@celery.task
+def fire_reminders(reminder_ids, grace_seconds: float = 0):
+    # Sent by the scheduler service (backend/tasks/scheduler.py) at the reminders' exact fire time.
+    # Reminders already claimed elsewhere, e.g. by check_reminders, are skipped by the claim.
+    return run_async(claim_and_deliver(reminder_ids, grace_seconds))
+
+async def claim_and_deliver(reminder_ids, grace_seconds: float, on_progress=None) -> dict:
+    reminders = await claim_reminders_by_id(reminder_ids, grace_seconds)
+    return await deliver_reminders(reminders, on_progress=on_progress)
+
+async def deliver_reminder(r) -> str:
+    """Send one claimed reminder over the user's preferred channels and return its delivery status."""
+    if not r["user_found"]:
+        return "user-not-found"
+    if r["already_sent"]:
+        return "duplicate"
+
+    sends = []
+    if r["preferred_notification"] in ("email", "both"):
+        subject = f"Health Reminder: Take your {r['medicine']} at {r['reminder_time']}"
+        body = (
+            f"Hello,\n\n"
+            f"This is your scheduled health reminder from Health Assistant.\n\n"
+            f"💊 Medicine: {r['medicine']}\n"
+            f"⏰ Time: {r['reminder_time']}\n\n"
+            f"For more details, visit {BASE_URL}/health-assistant\n\n"
+            "Stay healthy and take care!\n"
+            "— Your Health Assistant Team\n\n"
+            "You received this reminder because you opted in via our app."
         )
-    finally:
-        await conn.close()
+        sends.append(("email", get_email_client().send(r["email"], subject, body)))
+
+    if r["preferred_notification"] in ("sms", "both") and r["phone"]:
+        sms_body = f"💊 Reminder: Take {r['medicine']} at {r['reminder_time']}"
+        sends.append(("sms", send_sms_async(r["phone"], sms_body)))
+
+    if not sends:
+        return "no-delivery"
+    results = await asyncio.gather(*(send for _, send in sends))
+    delivered = [channel for (channel, _), result in zip(sends, results) if result.ok]
+    return "-".join(delivered) + "-sent" if delivered else "failed"
+
+async def deliver_reminders(reminders, on_progress=None) -> dict:
+    """Send claimed reminders concurrently, log their history, and return counts per delivery status."""
+    semaphore = asyncio.Semaphore(REMINDER_SEND_CONCURRENCY)
+    done = 0
+
+    async def deliver_one(r):
+        nonlocal done
+        async with semaphore:
+            try:
+                status = await deliver_reminder(r)
+            except Exception as e:
+                logger.error(f"❌ Failed to send reminder: {e}")
+                status = "failed"
+        done += 1
+        if on_progress and done % REMINDER_PROGRESS_EVERY == 0:
+            # Result backend writes are blocking
+            await asyncio.to_thread(on_progress, done, len(reminders))
+        return (r["id"], r["user_id"], status)
+
+    history = await asyncio.gather(*(deliver_one(r) for r in reminders))
+
+    # One INSERT for the whole batch instead of a connection per reminder; duplicates are already in it
+    await log_reminder_history_batch(entry for entry in history if entry[2] != "duplicate")
+    return dict(Counter(status for _, _, status in history))
+
+# 🔍 Reminders whose next_fire_at has passed, tagged with a shard derived from their user id
+async def get_due_reminder_shards(limit: int, shards: int):
+    async with get_connection() as conn:
+        return await queries.fetch(conn, "due_reminder_shards", limit, shards)
+
+async def get_recent_reminder_shards(limit: int, shards: int, within_seconds: float):
+    async with get_connection() as conn:
+        return await queries.fetch(conn, "recent_reminder_shards", limit, shards, float(within_seconds))
+
+# ⏰ Reminders overdue by more than older_than_seconds, oldest first
+async def get_missed_reminder_shards(limit: int, shards: int, older_than_seconds: float):
+    async with get_connection() as conn:
+        return await queries.fetch(conn, "missed_reminder_shards", limit, shards, float(older_than_seconds))
+
+# DB clock now, and seconds since check_reminders was last caught up (None before the first run)
+async def get_reminder_run_state():
+    async with get_connection() as conn:
+        return await queries.fetchrow(conn, "reminder_run_state", REMINDER_WATERMARK)
+
+async def advance_reminder_watermark(caught_up_at: float):
+    async with get_connection() as conn:
+        await queries.execute(conn, "advance_reminder_watermark", REMINDER_WATERMARK, float(caught_up_at))
+
+# Claim reminders (rescheduling them atomically) along with the contact details of their owners
+async def claim_reminders_by_id(reminder_ids, grace_seconds: float):
+    async with get_connection() as conn:
+        return await queries.fetch(conn, "claim_reminders_by_id", list(reminder_ids), float(grace_seconds))
 
 # 🔁 Schedule task every minute
 celery.conf.beat_schedule = {
     "check-reminders-every-minute": {
         "task": "backend.tasks.tasks.check_reminders",
-        "schedule": 60.0,
+        "schedule": CHECK_REMINDERS_INTERVAL,
+    },
+    "reap-refresh-tokens-hourly": {
+        "task": "backend.tasks.maintenance.reap_refresh_tokens",
+        "schedule": 3600.0,
+    },
+    "prune-reminder-history-daily": {
+        "task": "backend.tasks.maintenance.prune_reminder_history",
+        "schedule": 86400.0,
     },
 }
\ No newline at end of file
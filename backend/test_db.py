@@ -1,11 +1,11 @@
 import asyncio
-from database import init_db, get_db_connection
+from backend.database import init_db, get_connection, close_pool
 
 async def test():
     await init_db()
-    conn = await get_db_connection()
-    tables = await conn.fetch("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
+    async with get_connection() as conn:
+        tables = await conn.fetch("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'")
     print("Tables in public schema:", [t["table_name"] for t in tables])
-    await conn.close()
+    await close_pool()
 
 asyncio.run(test())
\ No newline at end of file
@@ -0,0 +1,110 @@
+# backend/tests/test_general_query_parser.py
+import json
+import os
+
+import pytest
+
+# health_assistant builds its OpenAI client at import time
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from backend.health_assistant import parse_general_query_answer
+
+def _answer(**overrides) -> str:
+    data = {
+        "category": "symptom",
+        "content": "You may have the flu.",
+        "diagnosis": {
+            "diagnosis": "Influenza",
+            "description": "Viral infection of the respiratory tract.",
+            "severity": "moderate",
+            "specialty": "General Practitioner",
+            "confidence": 0.7,
+        },
+    }
+    data.update(overrides)
+    return json.dumps(data)
+
+def _diagnosis(**overrides) -> dict:
+    return {**json.loads(_answer())["diagnosis"], **overrides}
+
+def test_symptom_answer():
+    answer = parse_general_query_answer(_answer())
+    assert answer == {
+        "category": "symptom",
+        "content": "You may have the flu.",
+        "diagnosis": {
+            "diagnosis": "Influenza",
+            "description": "Viral infection of the respiratory tract.",
+            "severity": "moderate",
+            "specialty": "General Practitioner",
+            "confidence": 0.7,
+        },
+    }
+
+@pytest.mark.parametrize("fence", ["```json\n{}\n```", "```\n{}\n```"])
+def test_fenced_json(fence):
+    answer = parse_general_query_answer(fence.replace("{}", _answer(category="medicine", diagnosis=None)))
+    assert answer["category"] == "medicine"
+    assert answer["content"] == "You may have the flu."
+    assert answer["diagnosis"] is None
+
+def test_uppercase_category_is_lowered():
+    assert parse_general_query_answer(_answer(category="SYMPTOM"))["category"] == "symptom"
+
+def test_unknown_category_falls_back_to_general():
+    answer = parse_general_query_answer(_answer(category="astrology"))
+    assert answer["category"] == "general"
+    assert answer["diagnosis"] is None
+
+@pytest.mark.parametrize("raw, expected", [("HIGH", "high"), (" Low ", "low"), ("severe", "moderate"), (None, "moderate")])
+def test_severity_normalization(raw, expected):
+    answer = parse_general_query_answer(_answer(diagnosis=_diagnosis(severity=raw)))
+    assert answer["diagnosis"]["severity"] == expected
+
+@pytest.mark.parametrize("raw, expected", [(1.7, 1.0), (-0.2, 0.0), ("0.4", 0.4), (0.55, 0.55)])
+def test_confidence_is_clamped(raw, expected):
+    answer = parse_general_query_answer(_answer(diagnosis=_diagnosis(confidence=raw)))
+    assert answer["diagnosis"]["confidence"] == expected
+
+@pytest.mark.parametrize("raw", ["very sure", None, [0.9]])
+def test_non_numeric_confidence_defaults(raw):
+    answer = parse_general_query_answer(_answer(diagnosis=_diagnosis(confidence=raw)))
+    assert answer["diagnosis"]["confidence"] == 0.5
+
+def test_missing_diagnosis_fields_get_defaults():
+    answer = parse_general_query_answer(_answer(diagnosis={}))
+    assert answer["diagnosis"] == {
+        "diagnosis": "Unknown",
+        "description": "No description.",
+        "severity": "moderate",
+        "specialty": "General Practitioner",
+        "confidence": 0.5,
+    }
+
+@pytest.mark.parametrize("text", ["Ibuprofen is usually taken every 6 hours.", "{\"category\": \"symptom\""])
+def test_non_json_text_becomes_general_answer(text):
+    assert parse_general_query_answer(text) == {"category": "general", "content": text, "diagnosis": None}
+
+@pytest.mark.parametrize("text", ["[1, 2]", "\"just a string\"", "42", "null"])
+def test_non_object_json_becomes_general_answer(text):
+    answer = parse_general_query_answer(text)
+    assert answer["category"] == "general"
+    assert answer["diagnosis"] is None
+
+@pytest.mark.parametrize("text", ["", None])
+def test_empty_answer(text):
+    assert parse_general_query_answer(text) == {"category": "general", "content": "Unable to understand", "diagnosis": None}
+
+@pytest.mark.parametrize("category", ["medicine", "general"])
+def test_diagnosis_ignored_for_non_symptom_categories(category):
+    answer = parse_general_query_answer(_answer(category=category))
+    assert answer["category"] == category
+    assert answer["diagnosis"] is None
+
+def test_symptom_without_diagnosis_object():
+    answer = parse_general_query_answer(_answer(diagnosis="influenza"))
+    assert answer["category"] == "symptom"
+    assert answer["diagnosis"] is None
+
+def test_blank_content_gets_placeholder():
+    assert parse_general_query_answer(_answer(content="  "))["content"] == "Unable to understand"
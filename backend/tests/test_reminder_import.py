@@ -0,0 +1,74 @@
+# backend/tests/test_reminder_import.py
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from backend.services import reminders
+
+ROWS = [
+    {"medicine": "Ibuprofen", "reminder_time": "08:00"},
+    {"medicine": "Vitamin D, \"forte\"", "reminder_time": "09:30", "frequency": "weekly"},
+    42,
+]
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def _parse(data: bytes, content_type: str, size: int = 3, content_length: str = None) -> list:
+    async def collect():
+        body = reminders._read_limited(_chunks(data, size), content_length)
+        return [row async for row in reminders.parse_reminder_import(body, content_type)]
+    return asyncio.run(collect())
+
+def _status(call) -> int:
+    with pytest.raises(HTTPException) as e:
+        call()
+    return e.value.status_code
+
+@pytest.mark.parametrize("size", [1, 2, 5, 4096])
+def test_json_array_across_chunk_boundaries(size):
+    assert _parse(json.dumps(ROWS).encode(), "application/json", size) == ROWS
+
+def test_json_array_with_bom_and_whitespace():
+    assert _parse(b"\xef\xbb\xbf \n" + json.dumps(ROWS).encode() + b"\n", "application/json") == ROWS
+
+@pytest.mark.parametrize("body", [b"", b"{}", b"[1", b"[1,]", b"[1 2]", b"[1] x", b"\xff\xfe"])
+def test_malformed_json_is_rejected(body):
+    assert _status(lambda: _parse(body, "application/json", 1)) == 400
+
+def test_json_lines():
+    body = b"\n".join(json.dumps(row).encode() for row in ROWS) + b"\n\n"
+    assert _parse(body, "application/x-ndjson", 4) == ROWS
+
+def test_csv_with_quoted_fields():
+    body = b'medicine, reminder_time ,frequency\r\n"Ibu, 200mg",08:00,\n"two\nlines",09:00,weekly\n'
+    assert _parse(body, "text/csv", 5) == [
+        {"medicine": "Ibu, 200mg", "reminder_time": "08:00"},
+        {"medicine": "two\nlines", "reminder_time": "09:00", "frequency": "weekly"},
+    ]
+
+def test_declared_content_length_over_the_limit(monkeypatch):
+    monkeypatch.setattr(reminders, "REMINDER_IMPORT_MAX_BYTES", 100)
+    assert _status(lambda: _parse(b"[]", "application/json", content_length="101")) == 413
+
+def test_streamed_bytes_over_the_limit(monkeypatch):
+    monkeypatch.setattr(reminders, "REMINDER_IMPORT_MAX_BYTES", 10)
+    assert _status(lambda: _parse(json.dumps(ROWS).encode(), "application/json")) == 413
+
+def test_row_cap_stops_reading(monkeypatch):
+    monkeypatch.setattr(reminders, "REMINDER_IMPORT_MAX_ROWS", 2)
+    consumed = []
+
+    async def rows():
+        for row in ROWS * 100:
+            consumed.append(row)
+            yield row
+
+    assert _status(lambda: asyncio.run(reminders.validate_reminder_import(rows()))) == 413
+    assert len(consumed) == 3
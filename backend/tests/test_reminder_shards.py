@@ -0,0 +1,49 @@
+# backend/tests/test_reminder_shards.py
+import asyncio
+import os
+
+import pytest
+
+from backend.queries import QUERIES, REMINDER_SHARD
+
+INT4_MIN = -2**31
+INT4_MAX = 2**31 - 1
+SHARD_QUERIES = ["due_reminder_shards", "recent_reminder_shards", "missed_reminder_shards"]
+
+# Set to a scratch Postgres to also evaluate the expression in the database
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+def _shard(hash_value: int, shards: int) -> int:
+    # REMINDER_SHARD with Postgres int4 semantics: & keeps the type, % truncates toward zero
+    masked = hash_value & INT4_MAX
+    assert INT4_MIN <= masked <= INT4_MAX
+    return int(masked - shards * int(masked / shards))
+
+@pytest.mark.parametrize("name", SHARD_QUERIES)
+def test_shard_queries_use_the_masked_hash(name):
+    assert REMINDER_SHARD in QUERIES[name]
+    assert "abs(" not in QUERIES[name]
+
+@pytest.mark.parametrize("hash_value", [INT4_MIN, INT4_MIN + 1, -1, 0, 1, INT4_MAX])
+@pytest.mark.parametrize("shards", [1, 7, 16, 64])
+def test_shard_is_in_range(hash_value, shards):
+    assert 0 <= _shard(hash_value, shards) < shards
+
+def test_int_min_lands_on_shard_zero():
+    # abs(-2147483648) is out of int4 range; the mask maps it to 0
+    assert _shard(INT4_MIN, 16) == 0
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+@pytest.mark.parametrize("hash_value", [INT4_MIN, -1, INT4_MAX])
+def test_shard_expression_in_postgres(hash_value):
+    import asyncpg
+
+    async def evaluate():
+        conn = await asyncpg.connect(TEST_DATABASE_URL)
+        try:
+            expression = REMINDER_SHARD.replace("hashtext(user_id::text)", "$1::int4")
+            return await conn.fetchval(f"SELECT {expression}", hash_value, 16)
+        finally:
+            await conn.close()
+
+    assert asyncio.run(evaluate()) == _shard(hash_value, 16)
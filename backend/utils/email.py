@@ -1,35 +1,118 @@
 # backend/utils/email.py
+# SendGrid v3 mail client built on httpx.
+#
+# EmailClient keeps one pooled keep-alive connection set to the provider and caps the number
+# of requests in flight, so send_many() can fan out hundreds of messages without opening a
+# socket (and TLS handshake) per message. SENDGRID_API_BASE_URL points it at a local stub
+# server for tests and benchmarks (see backend/benchmarks/bench_email.py).
+import asyncio
+import logging
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from dataclasses import dataclass
+import httpx
+from dotenv import load_dotenv
 
+load_dotenv()
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 EMAIL_USER = os.getenv("EMAIL_USER")  # Sender email (must be verified in SendGrid)
+SENDGRID_API_BASE_URL = os.getenv("SENDGRID_API_BASE_URL", "https://api.sendgrid.com")
+EMAIL_MAX_CONCURRENCY = int(os.getenv("EMAIL_MAX_CONCURRENCY", 20))
+EMAIL_TIMEOUT = float(os.getenv("EMAIL_TIMEOUT", 10))
 
-def send_email(to_email: str, subject: str, body: str):
-    # Debug: Print environment variables and inputs
-    print(f"SENDGRID_API_KEY: {SENDGRID_API_KEY}")
-    print(f"EMAIL_USER: {EMAIL_USER}")
-    print(f"Sending email to: {to_email}")
-    print(f"Subject: {subject}")
-    print(f"Body: {body}")
-
-    # Validate inputs
-    if not all([SENDGRID_API_KEY, EMAIL_USER]):
+SEND_PATH = "/v3/mail/send"
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class EmailResult:
+    to_email: str
+    ok: bool
+    status_code: int = None
+    error: str = None
+
+def _validate(api_key, sender, to_email, subject, body):
+    if not all([api_key, sender]):
         raise ValueError("Missing SendGrid configuration: Ensure SENDGRID_API_KEY and EMAIL_USER are set in .env")
     if not all([to_email, subject, body]):
         raise ValueError("Missing email parameters: to_email, subject, and body must be provided")
 
-    try:
-        message = Mail(
-            from_email=EMAIL_USER,
-            to_emails=to_email,
-            subject=subject,
-            plain_text_content=body
+def _payload(sender: str, to_email: str, subject: str, body: str) -> dict:
+    return {
+        "personalizations": [{"to": [{"email": to_email}]}],
+        "from": {"email": sender},
+        "subject": subject,
+        "content": [{"type": "text/plain", "value": body}],
+    }
+
+def _result(to_email: str, response: httpx.Response) -> EmailResult:
+    if response.is_success:
+        return EmailResult(to_email, True, response.status_code)
+    return EmailResult(to_email, False, response.status_code, f"SendGrid returned {response.status_code}: {response.text[:200]}")
+
+class EmailClient:
+    """Async SendGrid client; create once and reuse, then aclose() on shutdown."""
+
+    def __init__(self, api_key: str = None, sender: str = None, base_url: str = None,
+                 max_concurrency: int = None, timeout: float = None):
+        self.api_key = api_key or SENDGRID_API_KEY
+        self.sender = sender or EMAIL_USER
+        max_concurrency = max_concurrency or EMAIL_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url or SENDGRID_API_BASE_URL,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=timeout or EMAIL_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
         )
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print(f"Email sent to {to_email} with status code: {response.status_code}")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        raise
\ No newline at end of file
+
+    async def send(self, to_email: str, subject: str, body: str) -> EmailResult:
+        """Send one message. Failures are reported in the result rather than raised."""
+        try:
+            _validate(self.api_key, self.sender, to_email, subject, body)
+            async with self._semaphore:
+                response = await self._client.post(SEND_PATH, json=_payload(self.sender, to_email, subject, body))
+            result = _result(to_email, response)
+        except Exception as e:
+            result = EmailResult(to_email, False, error=str(e) or type(e).__name__)
+        if not result.ok:
+            logger.warning(f"Failed to send email to {to_email}: {result.error}")
+        return result
+
+    async def send_many(self, messages) -> list:
+        """Send (to_email, subject, body) tuples concurrently; results come back in input order."""
+        return await asyncio.gather(*(self.send(*message) for message in messages))
+
+    async def aclose(self):
+        await self._client.aclose()
+
+_client = None
+_sync_client = None
+
+def get_email_client() -> EmailClient:
+    global _client
+    if _client is None:
+        _client = EmailClient()
+    return _client
+
+async def close_email_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def send_email(to_email: str, subject: str, body: str):
+    """Blocking send for sync callers (Celery tasks); raises on failure."""
+    global _sync_client
+    _validate(SENDGRID_API_KEY, EMAIL_USER, to_email, subject, body)
+    if _sync_client is None:
+        _sync_client = httpx.Client(
+            base_url=SENDGRID_API_BASE_URL,
+            headers={"Authorization": f"Bearer {SENDGRID_API_KEY}"},
+            timeout=EMAIL_TIMEOUT,
+        )
+
+    result = _result(to_email, _sync_client.post(SEND_PATH, json=_payload(EMAIL_USER, to_email, subject, body)))
+    if not result.ok:
+        logger.error(f"Failed to send email to {to_email}: {result.error}")
+        raise RuntimeError(result.error)
+    logger.info(f"Email sent to {to_email} with status code: {result.status_code}")
@@ -1,17 +1,89 @@
-from twilio.rest import Client
+# backend/utils/sms.py
+# Twilio SMS sending through one long-lived client.
+#
+# The Twilio SDK is synchronous, so concurrent sends run on a bounded thread pool that shares
+# the client's keep-alive connection pool (one connection per worker). Every send returns an
+# SmsResult instead of raising, so callers can tell delivered from failed. TWILIO_API_BASE_URL
+# points the client at a local fake endpoint for tests and benchmarks (see bench_sms.py).
+import asyncio
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
 
 load_dotenv()
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", 32))
+SMS_TIMEOUT = float(os.getenv("SMS_TIMEOUT", 10))
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SmsResult:
+    to_number: str
+    ok: bool
+    sid: str = None
+    status: str = None  # Twilio message status, e.g. "queued"
+    status_code: int = None
+    error_code: int = None  # Twilio error code, e.g. 21211 for an invalid number
+    error: str = None
+
+_client = None
+_client_lock = threading.Lock()
+_executor = None
+
+def get_twilio_client() -> Client:
+    global _client
+    with _client_lock:
+        if _client is None:
+            http_client = TwilioHttpClient(timeout=SMS_TIMEOUT)
+            adapter = HTTPAdapter(pool_maxsize=SMS_WORKERS)
+            http_client.session.mount("https://", adapter)
+            http_client.session.mount("http://", adapter)
+            _client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=http_client)
+            if TWILIO_API_BASE_URL:
+                _client.api.base_url = TWILIO_API_BASE_URL
+        return _client
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=SMS_WORKERS, thread_name_prefix="sms")
+    return _executor
+
+def send_sms_notification(to_number: str, body: str) -> SmsResult:
+    """Blocking send; failures are reported in the result rather than raised."""
+    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER]):
+        result = SmsResult(to_number, False, error="Missing Twilio configuration")
+    else:
+        try:
+            message = get_twilio_client().messages.create(body=body, from_=TWILIO_PHONE_NUMBER, to=to_number)
+            result = SmsResult(to_number, True, sid=message.sid, status=message.status)
+        except TwilioRestException as e:
+            result = SmsResult(to_number, False, status_code=e.status, error_code=e.code, error=e.msg)
+        except Exception as e:
+            result = SmsResult(to_number, False, error=str(e) or type(e).__name__)
+
+    if result.ok:
+        logger.info(f"SMS sent to {to_number} ({result.sid})")
+    else:
+        logger.warning(f"Failed to send SMS to {to_number}: {result.error}")
+    return result
+
+async def send_sms_async(to_number: str, body: str) -> SmsResult:
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_executor(), send_sms_notification, to_number, body
+    )
 
-def send_sms_notification(to_number: str, body: str):
-    try:
-        client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
-        client.messages.create(
-            body=body,
-            from_=os.getenv("TWILIO_PHONE_NUMBER"),
-            to=to_number
-        )
-        print(f"SMS sent to {to_number}")
-    except Exception as e:
-        print(f"Failed to send SMS: {e}")
+async def send_many_sms(messages) -> list:
+    """Send (to_number, body) pairs, up to SMS_WORKERS at a time; results come back in input order."""
+    return await asyncio.gather(*(send_sms_async(*message) for message in messages))